@@ -0,0 +1,108 @@
+import re
+
+from scaling import UNITS, convert, kitchen_amount, parse_quantity
+
+# preparation words that don't change what gets bought; words that pick a
+# different product ("whole milk", "fresh mozzarella", "large eggs") stay out
+PREP_WORDS = {
+    'chopped', 'diced', 'minced', 'sliced', 'grated', 'shredded', 'crushed', 'peeled',
+    'finely', 'coarsely', 'thinly', 'roughly', 'freshly', 'softened', 'melted',
+    'divided', 'packed', 'room', 'temperature', 'about', 'plus', 'more', 'for',
+    'serving', 'optional', 'to', 'taste', 'and', 'or',
+}
+# base unit used when summing each dimension, and the US unit shown afterwards
+BASE_UNITS = {'volume': 'ml', 'weight': 'g'}
+DISPLAY_UNITS = {'ml': 'tsp', 'g': 'oz'}
+
+
+def singular(word: str) -> str:
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes')) and len(word) > 4:
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def normalize_name(name: str) -> str:
+    """Reduce an ingredient name to what is bought: 'Garlic cloves, finely grated' -> 'garlic clove'"""
+    name = re.sub(r'\(.*?\)', ' ', str(name).lower())
+    name = name.split(',')[0]
+    words = [w for w in re.findall(r"[a-z]+", name) if w not in PREP_WORDS]
+    return ' '.join(singular(w) for w in words)
+
+
+def _measure(ingredient: dict):
+    """(dimension key, amount in base units) so compatible units can be summed"""
+    value, unit = parse_quantity(ingredient.get('amount'), ingredient.get('unit', ''))
+    if value is None:
+        return None, None
+    if unit in UNITS:
+        dimension = UNITS[unit][0]
+        return dimension, convert(value, unit, BASE_UNITS[dimension])
+    return singular(unit or 'count'), value
+
+
+def aggregate_ingredients(recipe_ingredients: list) -> list:
+    """
+    Merge scaled ingredients from several recipes into distinct items to buy.
+
+    recipe_ingredients is a list with one scaled_ingredients list per recipe.
+    Ingredients with the same normalized name, category and compatible units
+    are summed. The normalized name is only the grouping 'key'; each merged
+    item is named (and so searched) after the first ingredient in it. Each
+    keeps a 'sources' list of (recipe index, ingredient index) pairs for
+    mapping results back.
+    """
+    merged = {}
+    for recipe_index, ingredients in enumerate(recipe_ingredients):
+        for ingredient_index, ingredient in enumerate(ingredients):
+            name = str(ingredient.get('name', ''))
+            normalized = normalize_name(name) or name
+            category = str(ingredient.get('category', '')).lower()
+            dimension, amount = _measure(ingredient)
+            key = (normalized, category, dimension)
+            item = merged.get(key)
+            if item is None:
+                item = merged[key] = {
+                    'name': name,
+                    'key': normalized,
+                    'amount': 0.0 if amount is not None else ingredient.get('amount'),
+                    'unit': BASE_UNITS.get(dimension, dimension or ingredient.get('unit', '')),
+                    'category': category,
+                    'notes': ingredient.get('notes', ''),
+                    'sources': []
+                }
+            if amount is not None:
+                item['amount'] += amount
+            item['sources'].append((recipe_index, ingredient_index))
+
+    items = list(merged.values())
+    for item in items:
+        if isinstance(item['amount'], float):
+            if item['unit'] in DISPLAY_UNITS:
+                display = DISPLAY_UNITS[item['unit']]
+                item['amount'], item['unit'] = convert(item['amount'], item['unit'], display), display
+            item['amount'], item['unit'] = kitchen_amount(item['amount'], item['unit'])
+    return items
+
+
+def distribute_results(merged: list, merged_results: list, recipe_ingredients: list) -> list:
+    """
+    Map one search result per merged item back onto every recipe.
+
+    Returns one results list per recipe, in the recipe's ingredient order,
+    with each entry carrying the recipe's own ingredient and quantity.
+    """
+    per_recipe = [[None] * len(ingredients) for ingredients in recipe_ingredients]
+    for item, result in zip(merged, merged_results):
+        for recipe_index, ingredient_index in item['sources']:
+            ingredient = recipe_ingredients[recipe_index][ingredient_index]
+            product = dict(result.get('product', {}))
+            product['quantity_needed'] = f"{ingredient.get('amount')} {ingredient.get('unit') or ''}".strip()
+            product['plan_quantity'] = f"{item['amount']} {item['unit'] or ''}".strip()
+            entry = dict(result, ingredient=ingredient, product=product)
+            entry['shared_with'] = len(item['sources']) - 1
+            per_recipe[recipe_index][ingredient_index] = entry
+    return per_recipe
@@ -0,0 +1,463 @@
+import argparse
+import contextlib
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from scaling import UNIT_ALIASES, UNITS, normalize_unit, parse_number
+from tracing import Tracer, profile_run
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECIPES_DIR = os.path.join(FIXTURES_DIR, "recipes")
+STAGES = ("fetch", "parse", "scale", "search", "cost", "save")
+
+CATEGORY_WORDS = {
+    'meat': ['bacon', 'chicken', 'beef', 'pork', 'sausage', 'turkey'],
+    'dairy': ['cream', 'cheese', 'cheddar', 'parmesan', 'butter', 'milk', 'yogurt'],
+    'produce': ['garlic', 'potato', 'scallion', 'onion', 'parsley', 'vegetable', 'herb'],
+    'spices': ['pepper', 'paprika', 'cumin', 'oregano', 'cinnamon'],
+}
+_QUANTITY_LINE = re.compile(r'^-?\s*([\d½⅓⅔¼¾⅛⅜⅝⅞/.]+(?:\s+[\d½⅓⅔¼¾⅛/]+)?)\s*(.+)$')
+
+
+# ---------------------------------------------------------------------------
+# Local stand-ins
+# ---------------------------------------------------------------------------
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RecipeSiteHandler(_QuietHandler):
+    """Serves recorded recipe pages from fixtures/recipes with ETag revalidation"""
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        name = os.path.basename(urlparse(self.path).path)
+        path = os.path.join(RECIPES_DIR, name)
+        if not os.path.isfile(path):
+            self._send(404, b"not found", "text/plain")
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(200, body, "text/html; charset=utf-8", {"ETag": etag})
+
+
+class FakeStoreHandler(_QuietHandler):
+    """
+    Search results page with __NEXT_DATA__ state and result tiles, built from
+    store_products.json, plus product pages, a bulk add-to-cart link and a
+    cart page for exercising the cart stage.
+    """
+
+    def _cart_badge(self) -> str:
+        with self.server.cart_lock:
+            count = sum(self.server.cart.values())
+        return f'<a href="/cart"><span data-automation-id="cart-count">{count}</span></a>'
+
+    def _add_to_cart(self, query: dict):
+        # items=ID|QTY,ID|QTY like the store's affiliate link
+        with self.server.cart_lock:
+            for entry in query.get('items', [''])[0].split(','):
+                item_id, _, quantity = entry.partition('|')
+                if item_id:
+                    self.server.cart[item_id] = self.server.cart.get(item_id, 0) + int(quantity or 1)
+            count = sum(self.server.cart.values())
+        if query.get('ajax'):
+            self._send(200, str(count).encode(), "text/plain")
+        else:
+            self._cart_page()
+
+    def _cart_page(self):
+        with self.server.cart_lock:
+            lines = "".join(f'<div data-item-id="{item_id}">{quantity}</div>'
+                            for item_id, quantity in self.server.cart.items())
+        body = f'<html><body>{self._cart_badge()}{lines}</body></html>'
+        self._send(200, body.encode('utf-8'), "text/html; charset=utf-8")
+
+    def _product_page(self, item_id: str):
+        # the button updates the badge asynchronously, like the real page
+        script = ("document.getElementById('add').onclick = () => "
+                  f"fetch('/cart/addToCart?ajax=1&items={item_id}|1').then((r) => r.text())"
+                  ".then((n) => { document.querySelector('[data-automation-id=cart-count]').textContent = n; });")
+        body = (f'<html><body>{self._cart_badge()}<button id="add">Add to cart</button>'
+                f'<script>{script}</script></body></html>')
+        self._send(200, body.encode('utf-8'), "text/html; charset=utf-8")
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        parsed = urlparse(self.path)
+        if parsed.path == "/cart/addToCart":
+            self._add_to_cart(parse_qs(parsed.query))
+            return
+        if parsed.path == "/cart":
+            self._cart_page()
+            return
+        if parsed.path.startswith("/ip/"):
+            self._product_page(parsed.path.rstrip('/').rsplit('/', 1)[-1])
+            return
+        if parsed.path != "/search":
+            self._send(200, b"<html><body>product</body></html>", "text/html")
+            return
+        query = parse_qs(parsed.query).get('q', [''])[0].lower()
+        words = set(re.findall(r'[a-z]+', query))
+        scored = []
+        for product in self.server.products:
+            title_words = set(re.findall(r'[a-z]+', product['name'].lower()))
+            overlap = len(words & title_words)
+            if overlap:
+                scored.append((overlap, product))
+        scored.sort(key=lambda pair: -pair[0])
+        items = [dict(product, canonicalUrl=f"/ip/{product['usItemId']}",
+                      priceInfo={'linePrice': f"${product['price']:.2f}",
+                                 'unitPrice': product.get('unitPrice')})
+                 for _, product in scored[:10]]
+        state = {'props': {'pageProps': {'initialData': {'searchResult': {
+            'itemStacks': [{'items': items}]
+        }}}}}
+        tiles = "".join(
+            f'<div data-item-id="{item["usItemId"]}"><a href="{item["canonicalUrl"]}">'
+            f'<span data-automation-id="product-title">{html.escape(item["name"])}</span></a>'
+            f'<div data-automation-id="product-price">current price {item["priceInfo"]["linePrice"]}</div></div>'
+            for item in items
+        )
+        body = (f'<html><head><title>{html.escape(query)} - Walmart.com</title></head><body>'
+                f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(state)}</script>'
+                f'{tiles}</body></html>')
+        self._send(200, body.encode('utf-8'), "text/html; charset=utf-8")
+
+
+def _guess_category(name: str) -> str:
+    lowered = name.lower()
+    for category, words in CATEGORY_WORDS.items():
+        if any(word in lowered for word in words):
+            return category
+    return 'pantry'
+
+
+def mock_parse(recipe_text: str) -> dict:
+    """Deterministic stand-in for the parse prompt: read quantity lines out of the recipe text"""
+    servings = re.search(r'(?:yield|serves)\D{0,12}(\d+)', recipe_text, re.IGNORECASE)
+    ingredients = []
+    for line in recipe_text.splitlines():
+        match = _QUANTITY_LINE.match(line.strip())
+        if not match:
+            continue
+        amount = parse_number(match.group(1))
+        rest = match.group(2).split()
+        unit = ''
+        if rest:
+            candidate = normalize_unit(rest[0])
+            if candidate in UNITS or rest[0].lower().rstrip('.') in UNIT_ALIASES:
+                unit = candidate
+                rest = rest[1:]
+        name = re.split(r'[,(]', " ".join(rest))[0].strip()
+        if amount is None or not name:
+            continue
+        ingredients.append({
+            'name': name,
+            'amount': round(amount, 3),
+            'unit': unit,
+            'category': _guess_category(name),
+            'notes': ''
+        })
+    return {
+        'servings': int(servings.group(1)) if servings else 4,
+        'meal_type': 'dinner',
+        'portion_size': '1 serving',
+        'calories_per_serving': 500,
+        'ingredients': ingredients
+    }
+
+
+def mock_completion(prompt: str) -> dict:
+    """Answer any of the assistant's prompts with plausible JSON"""
+    if "Recipes:\n=== Recipe" in prompt:
+        sections = re.split(r'^=== Recipe (\d+) ===$', prompt.split("Recipes:\n", 1)[1], flags=re.MULTILINE)
+        recipes = []
+        for i in range(1, len(sections), 2):
+            recipes.append(dict(mock_parse(sections[i + 1]), id=int(sections[i])))
+        return {'recipes': recipes}
+    if "Recipe text:" in prompt:
+        result = mock_parse(prompt.split("Recipe text:", 1)[1])
+        if "- storage_tips:" in prompt:
+            result['storage_tips'] = {item['name']: "Store cool and dry." for item in result['ingredients']}
+        return result
+    return {'storage_tips': {}}
+
+
+class MockOpenAIHandler(_QuietHandler):
+    """
+    OpenAI-compatible /v1/chat/completions with configurable latency and
+    chunked streaming. Models other than the flagship answer after
+    fast_latency, and invalid_rate of their parses come back with no
+    ingredients (picked by prompt hash, so runs are repeatable).
+    """
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request['messages'][-1]['content']
+        answer = mock_completion(prompt)
+        fast = request.get('model') != self.server.flagship
+        if fast and 'ingredients' in answer:
+            draw = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16) / 0xffffffff
+            if draw < self.server.invalid_rate:
+                answer['ingredients'] = []
+        content = json.dumps(answer)
+        usage = {
+            'prompt_tokens': len(prompt) // 4,
+            'completion_tokens': len(content) // 4,
+            'total_tokens': (len(prompt) + len(content)) // 4
+        }
+        time.sleep(self.server.fast_latency if fast else self.server.latency)
+
+        if not request.get('stream'):
+            body = json.dumps({
+                'id': 'chatcmpl-benchmark', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': request.get('model'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': usage
+            }).encode('utf-8')
+            self._send(200, body, "application/json")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload: dict):
+            data = f"data: {json.dumps(payload)}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        base = {'id': 'chatcmpl-benchmark', 'object': 'chat.completion.chunk',
+                'created': int(time.time()), 'model': request.get('model')}
+        for start in range(0, len(content), self.server.chunk_size):
+            event(dict(base, choices=[{'index': 0, 'finish_reason': None,
+                                       'delta': {'content': content[start:start + self.server.chunk_size]}}]))
+            time.sleep(self.server.chunk_delay)
+        event(dict(base, choices=[], usage=usage))
+        done = b"data: [DONE]\n\n"
+        self.wfile.write(f"{len(done):x}\r\n".encode() + done + b"\r\n0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_server(handler, **settings) -> ThreadingHTTPServer:
+    """Start a handler on a free local port in a daemon thread"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    for name, value in settings.items():
+        setattr(server, name, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+# ---------------------------------------------------------------------------
+# Benchmark run
+# ---------------------------------------------------------------------------
+
+def _no_browser():
+    raise RuntimeError("benchmark runs without a browser")
+
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_benchmark(args) -> dict:
+    from main import MODELID, RecipeAssistant
+
+    with open(os.path.join(FIXTURES_DIR, "store_products.json")) as f:
+        products = json.load(f)
+    recipe_site = start_server(RecipeSiteHandler, latency=args.fetch_latency)
+    store = start_server(FakeStoreHandler, latency=args.store_latency, products=products,
+                         cart={}, cart_lock=threading.Lock())
+    llm = start_server(MockOpenAIHandler, latency=args.llm_latency, fast_latency=args.fast_llm_latency,
+                       flagship=MODELID, invalid_rate=args.invalid_rate,
+                       chunk_size=args.chunk_size, chunk_delay=args.chunk_delay)
+    os.environ["OPENAI_BASE_URL"] = server_url(llm) + "/v1"
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+
+    fixtures = sorted(name for name in os.listdir(RECIPES_DIR) if name.endswith(".html"))
+    urls = [f"{server_url(recipe_site)}/recipes/{fixtures[i % len(fixtures)]}?copy={i}"
+            for i in range(args.recipes)]
+
+    trace_path = os.path.abspath(args.trace) if args.trace else None
+    profile_path = os.path.abspath(args.profile_output) if args.profile_output else None
+    workdir = tempfile.mkdtemp(prefix="recipe-bench-")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    quiet = open(os.devnull, 'w') if not args.verbose else None
+    try:
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            assistant = RecipeAssistant(num_meals=args.meals, use_llm_cache=args.llm_cache,
+                                        use_search_cache=args.search_cache,
+                                        use_catalog=not args.no_catalog)
+            assistant.search_backend = "http"
+            assistant.store_base_url = server_url(store)
+            assistant.cart_bulk_url = "{base}/cart/addToCart?items={items}"
+            assistant.llm_mode = args.llm_mode
+            assistant.include_storage_tips = args.storage_tips
+            assistant.search_pool.drivers.factory = _no_browser
+            if trace_path:
+                assistant.tracer = Tracer(path=trace_path)
+            # measure the store's latency, not the politeness limiter in front of it
+            assistant.search_pool.limiter.rate = assistant.search_pool.limiter.max_rate = 1000.0
+            assistant.search_pool.limiter.burst = 1000
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            failed = 0
+            with profile_run(args.profile, profile_path):
+                if args.mode == "batch" and args.results == "jsonl":
+                    results = assistant.process_recipe_urls(urls, aggregate=args.aggregate,
+                                                            results_path="results.jsonl")
+                    failed = sum('error' in result for result in results)
+                elif args.mode == "batch":
+                    results = assistant.process_recipe_urls(urls, aggregate=args.aggregate)
+                    for i, result in enumerate(results):
+                        failed += 'error' in result
+                        assistant.save_results(result, f"result_{i}.json")
+                else:
+                    process = (assistant.process_recipe_url_streaming if args.mode == "stream"
+                               else assistant.process_recipe_url)
+                    for i, url in enumerate(urls):
+                        try:
+                            filename = "results.jsonl" if args.results == "jsonl" else f"result_{i}.json"
+                            assistant.save_results(process(url), filename)
+                        except Exception as e:
+                            print(f"Error processing {url}: {e}")
+                            failed += 1
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assistant.cleanup()
+    finally:
+        os.chdir(previous_dir)
+        if quiet:
+            quiet.close()
+        for server in (recipe_site, store, llm):
+            server.shutdown()
+
+    return {
+        'mode': args.mode,
+        'llm_mode': args.llm_mode,
+        'recipes': args.recipes,
+        'failed': failed,
+        'elapsed_s': round(elapsed, 3),
+        'recipes_per_minute': round(args.recipes / elapsed * 60, 1) if elapsed else None,
+        'stages': assistant.timings.summary(),
+        'llm': assistant.token_usage.totals(),
+        'llm_routing': assistant.router.stats(),
+        'peak_python_mb': round(peak / (1024 * 1024), 2),
+        'max_rss_mb': _max_rss_mb(),
+        'workdir': workdir
+    }
+
+
+def print_report(report: dict):
+    print(f"\nBenchmark: {report['recipes']} recipes, mode={report['mode']}, "
+          f"llm_mode={report['llm_mode']}, failed={report['failed']}")
+    print(f"{'stage':<8} {'count':>6} {'p50 (s)':>10} {'p95 (s)':>10} {'total (s)':>10}")
+    for stage in STAGES:
+        stats = report['stages'].get(stage)
+        if stats:
+            print(f"{stage:<8} {stats['count']:>6} {stats['p50']:>10.4f} "
+                  f"{stats['p95']:>10.4f} {stats['total']:>10.3f}")
+    print(f"\nWall time:   {report['elapsed_s']:.2f}s")
+    print(f"Throughput:  {report['recipes_per_minute']} recipes/min")
+    print(f"LLM:         {report['llm']}")
+    routing = report['llm_routing']
+    rate = routing['escalation_rate']
+    print(f"LLM routing: {routing['requests']} requests, escalation rate {'-' if rate is None else rate}")
+    for name, tier in routing['tiers'].items():
+        mean = '-' if tier['mean_seconds'] is None else f"{tier['mean_seconds']}s"
+        print(f"  {name:<28} {tier['calls']:>5} calls {tier['invalid']:>4} invalid "
+              f"{tier['errors']:>3} errors  mean {mean}")
+    print(f"Peak memory: {report['peak_python_mb']} MB traced Python heap, "
+          f"{report['max_rss_mb']} MB max RSS")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run RecipeAssistant end to end against local stand-ins "
+                    "(recorded recipe pages, mock OpenAI server, fake store).")
+    parser.add_argument("--recipes", type=int, default=20, help="recipe pages to process")
+    parser.add_argument("--meals", type=int, default=7, help="meals to scale each recipe for")
+    parser.add_argument("--mode", choices=["sequential", "stream", "batch"], default="sequential")
+    parser.add_argument("--llm-mode", choices=["two_call", "single_pass", "batched"], default="two_call")
+    parser.add_argument("--aggregate", action="store_true", help="merge ingredients across recipes (batch mode)")
+    parser.add_argument("--storage-tips", action="store_true", help="ask the LLM for storage tips")
+    parser.add_argument("--llm-latency", type=float, default=0.5,
+                        help="seconds before the mock LLM answers as the flagship model")
+    parser.add_argument("--fast-llm-latency", type=float, default=0.2,
+                        help="seconds before the mock LLM answers as any faster tier")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="fraction of fast-tier parses answered without ingredients")
+    parser.add_argument("--chunk-size", type=int, default=16, help="characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="seconds between streamed chunks")
+    parser.add_argument("--fetch-latency", type=float, default=0.05, help="seconds per recipe page")
+    parser.add_argument("--store-latency", type=float, default=0.1, help="seconds per store search page")
+    parser.add_argument("--llm-cache", action="store_true", help="enable the on-disk LLM cache")
+    parser.add_argument("--search-cache", action="store_true", help="enable the search result cache")
+    parser.add_argument("--results", choices=["jsonl", "json"], default="jsonl",
+                        help="append to one results.jsonl or write a JSON file per recipe")
+    parser.add_argument("--no-catalog", action="store_true", help="always search the store")
+    parser.add_argument("--trace", help="write spans to this JSONL file")
+    parser.add_argument("--profile", choices=["cprofile", "sampling"], help="profile the run")
+    parser.add_argument("--profile-output", help="where the profile is written")
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the assistant's own output")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
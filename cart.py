@@ -0,0 +1,186 @@
+import re
+from urllib.parse import quote
+
+CART_COUNT_SELECTORS = [
+    "[data-automation-id='cart-count']",
+    "[data-testid='cart-count']",
+    ".cart-count",
+    "a[href*='/cart'] [class*='count']"
+]
+CART_ITEM_SELECTOR = "[data-item-id]"
+ADD_BUTTON_XPATH = "//button[contains(., 'Add to cart')]"
+# Bulk add link: every item id with its quantity in one page load
+BULK_ADD_URL = "https://affil.walmart.com/cart/addToCart?items={items}"
+
+# Runs in the page; the cart badge number, 0 when there is none
+CART_COUNT_JS = """
+for (const selector of arguments[0]) {
+    const el = document.querySelector(selector);
+    if (el) {
+        const match = (el.innerText || el.textContent || '').match(/\\d+/);
+        if (match) return parseInt(match[0], 10);
+    }
+}
+return 0;
+"""
+# Runs in the cart page; quantity in the cart by item id. A line's quantity
+# comes from its quantity input or data-quantity, or its text when that is
+# only a number; a product link without a line counts as 1
+CART_ITEMS_JS = """
+const quantities = {};
+for (const el of document.querySelectorAll(arguments[0])) {
+    const id = el.getAttribute('data-item-id');
+    const input = el.querySelector("input[type='number'], [data-quantity]");
+    let text = el.getAttribute('data-quantity')
+        || (input && (input.value || input.getAttribute('data-quantity')));
+    if (!text && /^\\s*\\d+\\s*$/.test(el.textContent || '')) text = el.textContent;
+    quantities[id] = (quantities[id] || 0) + (parseInt(text, 10) || 1);
+}
+for (const link of document.querySelectorAll("a[href*='/ip/']")) {
+    const match = link.href.match(/\\/(\\d+)(?:[?#]|$)/);
+    if (match && !(match[1] in quantities)) quantities[match[1]] = 1;
+}
+return quantities;
+"""
+_ITEM_ID = re.compile(r'/ip/(?:[^/?#]+/)?(\d+)')
+
+
+def item_id_from_url(url: str):
+    """Store item id from a product URL (.../ip/<slug>/<id>), or None"""
+    match = _ITEM_ID.search(url or '')
+    return match.group(1) if match else None
+
+
+def cart_items(shopping_results: list) -> list:
+    """
+    Items to add from search results: each chosen product with the package
+    count from its purchase plan (1 when there is none).
+    """
+    items = []
+    for result in shopping_results:
+        purchase = result.get('purchase') or {}
+        packages = purchase.get('packages')
+        if packages:
+            for package in packages:
+                items.append({'item_id': package.get('item_id') or item_id_from_url(package.get('url')),
+                              'url': package.get('url'), 'name': package.get('name'),
+                              'quantity': package.get('count') or 1})
+            continue
+        product = result.get('product', {})
+        url = product.get('url')
+        if not url or url == "URL not found":
+            continue
+        items.append({'item_id': product.get('item_id') or item_id_from_url(url), 'url': url,
+                      'name': product.get('name'), 'quantity': 1})
+    return items
+
+
+def cart_count(driver) -> int:
+    return driver.execute_script(CART_COUNT_JS, CART_COUNT_SELECTORS) or 0
+
+
+def wait_for_cart_change(driver, before: int, timeout: float) -> bool:
+    """Block until the cart badge differs from before; False on timeout"""
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: cart_count(d) != before
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+class CartFiller:
+    """
+    Adds chosen products to the store cart with as few page loads as possible.
+
+    Items with an item id go through the bulk add link in chunks of
+    batch_size; the cart page is read before and after, and an item counts
+    as added only when its quantity in the cart grew by what was asked for.
+    Anything unconfirmed (or without an id) is added from its product page
+    once per missing package, waiting for the cart badge to change rather
+    than sleeping. A report is only 'added' when the full quantity went in;
+    'added_quantity' says how much did.
+    bulk_url and cart_url are templates so a local fake store can stand in.
+    """
+
+    def __init__(self, driver, base_url: str, bulk_url: str = BULK_ADD_URL,
+                 cart_url: str = "{base}/cart", batch_size: int = 20, timeout: float = 8.0):
+        self.driver = driver
+        self.base_url = base_url.rstrip('/')
+        self.bulk_url = bulk_url
+        self.cart_url = cart_url
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def add(self, items: list) -> list:
+        """Add items ({item_id, url, name, quantity}); returns one report per item"""
+        reports = [dict(item, added=False, added_quantity=0, method=None, error=None) for item in items]
+        bulk = [report for report in reports if report.get('item_id')] if self.bulk_url else []
+        if bulk:
+            self._add_bulk(bulk)
+        for report in reports:
+            if not report['added']:
+                self._add_from_product_page(report)
+        return reports
+
+    def _cart_quantities(self) -> dict:
+        """Quantity of every item in the cart, by item id"""
+        self.driver.get(self.cart_url.format(base=self.base_url))
+        quantities = self.driver.execute_script(CART_ITEMS_JS, CART_ITEM_SELECTOR) or {}
+        return {str(item_id): int(quantity) for item_id, quantity in quantities.items()}
+
+    def _add_bulk(self, reports: list):
+        try:
+            before = self._cart_quantities()
+            for start in range(0, len(reports), self.batch_size):
+                chunk = reports[start:start + self.batch_size]
+                items = ",".join(f"{report['item_id']}|{report.get('quantity') or 1}" for report in chunk)
+                self.driver.get(self.bulk_url.format(base=self.base_url, items=quote(items, safe='|,')))
+            after = self._cart_quantities()
+        except Exception as e:
+            print(f"Bulk add to cart failed, adding items one by one: {e}")
+            return
+        # the same product can appear in several reports; hand out what arrived in order
+        arrived = {}
+        for report in reports:
+            item_id = str(report['item_id'])
+            arrived.setdefault(item_id, after.get(item_id, 0) - before.get(item_id, 0))
+            wanted = report.get('quantity') or 1
+            got = max(min(arrived[item_id], wanted), 0)
+            arrived[item_id] -= got
+            report['added_quantity'] = got
+            if got == wanted:
+                report.update(added=True, method='bulk')
+
+    def _add_from_product_page(self, report: dict):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        url = report.get('url')
+        if not url or url == "URL not found":
+            report['error'] = "no product URL"
+            return
+        wanted = (report.get('quantity') or 1) - report['added_quantity']
+        added = 0
+        try:
+            self.driver.get(url)
+            for _ in range(wanted):
+                before = cart_count(self.driver)
+                button = WebDriverWait(self.driver, self.timeout, poll_frequency=0.1).until(
+                    EC.element_to_be_clickable((By.XPATH, ADD_BUTTON_XPATH))
+                )
+                button.click()
+                if not wait_for_cart_change(self.driver, before, self.timeout):
+                    report['error'] = "cart count did not change"
+                    break
+                added += 1
+        except Exception as e:
+            report['error'] = str(e)
+        report['added_quantity'] += added
+        if added == wanted:
+            report.update(added=True, method='product_page', error=None)
+        elif report['added_quantity']:
+            report['error'] = f"added only {report['added_quantity']} of {report.get('quantity') or 1}: {report['error']}"
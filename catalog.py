@@ -0,0 +1,155 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from matching import STOPWORDS
+from pricing import parse_price
+from product_search import rank_tiles
+from search_cache import CATEGORY_TTLS, DEFAULT_TTL
+
+# how many full-text hits are re-scored by the matcher
+FTS_LIMIT = 50
+
+class ProductCatalog:
+    """
+    Local catalog of every product tile seen in a search.
+
+    Products are keyed by item id and indexed with SQLite FTS5 (porter
+    stemming), so an ingredient can be answered from products scraped for
+    earlier, different queries. lookup() re-scores the full-text hits with
+    the product matcher and only answers when the best fresh product clears
+    min_score; otherwise the caller searches the store. Falls back to LIKE
+    queries when the SQLite build has no FTS5.
+    """
+
+    def __init__(self, path: str = ".cache/catalog.sqlite", min_score: float = 0.8,
+                 category_ttls: Optional[dict] = None, default_ttl: float = DEFAULT_TTL):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.min_score = min_score
+        self.category_ttls = dict(CATEGORY_TTLS, **(category_ttls or {}))
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS products (
+                item_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                url TEXT,
+                price TEXT,
+                price_value REAL,
+                unit_price TEXT,
+                category TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        try:
+            self._conn.executescript(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                    name, content='products', content_rowid='rowid', tokenize='porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+                    INSERT INTO products_fts(rowid, name) VALUES (new.rowid, new.name);
+                END;
+                CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+                    INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+                END;
+                CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE ON products BEGIN
+                    INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+                    INSERT INTO products_fts(rowid, name) VALUES (new.rowid, new.name);
+                END;"""
+            )
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"SQLite FTS5 unavailable, catalog falls back to LIKE queries: {e}")
+            self.fts = False
+        self._conn.commit()
+
+    def ttl_for(self, category: str) -> float:
+        return self.category_ttls.get((category or '').lower(), self.default_ttl)
+
+    def add(self, tiles: list, category: str = ''):
+        """Insert or refresh scraped tiles ({item_id, name, url, price})"""
+        now = time.time()
+        rows = []
+        for tile in tiles:
+            key = tile.get('item_id') or tile.get('url')
+            if not key or not tile.get('name'):
+                continue
+            price = parse_price(tile.get('price'))
+            rows.append((str(key), tile['name'], tile.get('url'), tile.get('price'),
+                         price['price'], price['unit_price'], (category or '').lower(), now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                """INSERT INTO products (item_id, name, url, price, price_value, unit_price, category, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(item_id) DO UPDATE SET
+                       name = excluded.name, url = excluded.url, price = excluded.price,
+                       price_value = excluded.price_value, unit_price = excluded.unit_price,
+                       category = excluded.category, updated_at = excluded.updated_at""",
+                rows
+            )
+            self._conn.commit()
+
+    def _query(self, words: list, since: float, category: str = '') -> list:
+        """Fresh products matching any of words, from the ingredient's category when it has one"""
+        columns = "p.item_id, p.name, p.url, p.price, p.price_value, p.unit_price"
+        same_category = "(? = '' OR p.category = ?)"
+        if self.fts:
+            match = " OR ".join(f'"{word}"' for word in words)
+            sql = (f"SELECT {columns} FROM products_fts JOIN products p ON p.rowid = products_fts.rowid "
+                   f"WHERE products_fts MATCH ? AND p.updated_at >= ? AND {same_category} "
+                   f"ORDER BY bm25(products_fts) LIMIT ?")
+            params = (match, since, category, category, FTS_LIMIT)
+        else:
+            where = " OR ".join("p.name LIKE ?" for _ in words)
+            sql = (f"SELECT {columns} FROM products p "
+                   f"WHERE ({where}) AND p.updated_at >= ? AND {same_category} LIMIT ?")
+            params = (*[f"%{word}%" for word in words], since, category, category, FTS_LIMIT)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def lookup(self, ingredient: dict, top_k: int = 5) -> Optional[list]:
+        """
+        Ranked fresh candidates for an ingredient, or None when the store has
+        to be searched. The catalog holds products found for other
+        ingredients, so only products from the ingredient's category are
+        considered.
+        """
+        words = [word for word in re.findall(r"[a-z]+", ingredient.get('name', '').lower())
+                 if word not in STOPWORDS]
+        if not words:
+            return None
+        category = (ingredient.get('category') or '').lower()
+        since = time.time() - self.ttl_for(category)
+        tiles = [
+            {'item_id': item_id, 'name': name, 'url': url, 'price': price,
+             'price_value': price_value, 'unit_price': unit_price}
+            for item_id, name, url, price, price_value, unit_price in self._query(words, since, category)
+        ]
+        candidates = rank_tiles(tiles, ingredient, top_k=top_k)
+        if not candidates or candidates[0]['score'] < self.min_score:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return candidates
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        return {'products': size, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# record field each pipeline stage produces
+STAGE_KEYS = {
+    "fetch": "original_recipe",
+    "parse": "parsed_recipe",
+    "scale": "scaled_recipe",
+    "search": "walmart_products",
+}
+
+
+def atomic_write_json(path: str, data):
+    """Write JSON so readers only ever see the old file or the complete new one"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class RecipeCheckpoint:
+    """
+    Finished work for one recipe run: one file per completed stage and one
+    per searched ingredient, each written atomically as soon as it is done.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.search_dir = os.path.join(directory, "search")
+        os.makedirs(self.search_dir, exist_ok=True)
+
+    def load(self, stage: str):
+        """A completed stage's output, or None"""
+        return _read_json(os.path.join(self.directory, f"{stage}.json"))
+
+    def save(self, stage: str, value):
+        atomic_write_json(os.path.join(self.directory, f"{stage}.json"), value)
+
+    @staticmethod
+    def ingredient_key(ingredient: dict) -> str:
+        identity = [ingredient.get('name'), ingredient.get('amount'), ingredient.get('unit')]
+        return hashlib.sha256(json.dumps(identity).encode('utf-8')).hexdigest()[:24]
+
+    def search_results(self) -> dict:
+        """Saved search results by ingredient key"""
+        results = {}
+        for filename in os.listdir(self.search_dir):
+            if filename.endswith(".json"):
+                result = _read_json(os.path.join(self.search_dir, filename))
+                if result is not None:
+                    results[filename[:-len(".json")]] = result
+        return results
+
+    def save_search(self, ingredient: dict, result: dict):
+        atomic_write_json(os.path.join(self.search_dir, f"{self.ingredient_key(ingredient)}.json"), result)
+
+
+class CheckpointStore:
+    """
+    Checkpoint directories for recipe runs, one per recipe URL and meal
+    count (scaled amounts depend on both). A run older than max_age seconds
+    is cleared and started over, so prices and pages are never resumed
+    from stale data.
+    """
+
+    def __init__(self, directory: str = ".cache/checkpoints", max_age: float = 24 * 3600):
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, recipe_url: str, servings: int) -> str:
+        key = hashlib.sha256(f"{recipe_url}|{servings}".encode('utf-8')).hexdigest()[:24]
+        return os.path.join(self.directory, key)
+
+    def for_recipe(self, recipe_url: str, servings: int) -> RecipeCheckpoint:
+        path = self._path(recipe_url, servings)
+        meta_path = os.path.join(path, "meta.json")
+        meta = _read_json(meta_path)
+        if meta is not None and time.time() - meta.get('started_at', 0) > self.max_age:
+            self.clear(recipe_url, servings)
+            meta = None
+        checkpoint = RecipeCheckpoint(path)
+        if meta is None:
+            atomic_write_json(meta_path, {'url': recipe_url, 'servings': servings,
+                                          'started_at': time.time()})
+        return checkpoint
+
+    def clear(self, recipe_url: str, servings: int):
+        """Forget a recipe's finished work so the next run starts over"""
+        path = self._path(recipe_url, servings)
+        for root, dirs, files in os.walk(path, topdown=False):
+            for filename in files:
+                os.remove(os.path.join(root, filename))
+            os.rmdir(root)
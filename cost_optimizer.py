@@ -0,0 +1,136 @@
+import math
+
+from matching import MATCH_THRESHOLD
+from pricing import parse_package
+from scaling import UNITS, convert, parse_quantity
+
+# grid steps the needed amount is split into (240 divides evenly by the usual fractions);
+# raised so the smallest package spans 24 steps
+RESOLUTION = 240
+MAX_RESOLUTION = 2400
+# below the match threshold the top candidate is still priced if it scores at least this
+FALLBACK_SCORE = 0.4
+# recipe units that a "N Count" / "1 Bunch" package can stand in for
+COUNT_LIKE = {'count', 'bunch', 'head', 'slice', 'stalk', 'sprig', 'can', 'package', 'stick', ''}
+# recipe units that are a fraction of a counted package: garlic is sold by the bulb
+PER_COUNT = {'clove': 10}
+
+
+def package_amount(size, unit, need_unit, name: str = ''):
+    """
+    A package's size in the unit the recipe needs, and whether that took an
+    approximation (volume <-> weight at the density of water, counting a
+    bunch as one of whatever the recipe counts, or a bulb as PER_COUNT
+    cloves). None when they don't mix.
+    """
+    if size is None or unit is None:
+        return None, False
+    if unit == need_unit:
+        return size, False
+    converted = convert(size, unit, need_unit)
+    if converted is not None:
+        return converted, False
+    if unit in UNITS and need_unit in UNITS:
+        return size * UNITS[unit][1] / UNITS[need_unit][1], True
+    if unit == 'count' and need_unit in COUNT_LIKE:
+        return size, need_unit not in ('count', '')
+    if unit == 'count' and need_unit in PER_COUNT:
+        # "Peeled Garlic Cloves, 20 Count" already counts cloves
+        if need_unit in (name or '').lower():
+            return size, False
+        return size * PER_COUNT[need_unit], True
+    return None, False
+
+
+def cheapest_cover(need: float, packages: list) -> tuple:
+    """
+    Cheapest multiset of packages whose sizes add up to at least need.
+
+    packages is a list of (size, price) in the unit of need. Sizes are
+    rounded to a grid of need / resolution steps (so coverage is exact to
+    within half a step per package) and the covering knapsack is solved by
+    dynamic programming over the grid. Returns (cost, counts per package).
+    """
+    smallest = min(size for size, _ in packages)
+    resolution = min(MAX_RESOLUTION, max(RESOLUTION, math.ceil(need / smallest) * 24))
+    step = need / resolution
+    sizes = [max(1, round(size / step)) for size, _ in packages]
+    prices = [price for _, price in packages]
+
+    best = [0.0] + [math.inf] * resolution
+    choice = [-1] * (resolution + 1)
+    for filled in range(1, resolution + 1):
+        for i, (size, price) in enumerate(zip(sizes, prices)):
+            cost = price + best[max(0, filled - size)]
+            if cost < best[filled]:
+                best[filled] = cost
+                choice[filled] = i
+
+    counts = [0] * len(packages)
+    filled = resolution
+    while filled > 0:
+        i = choice[filled]
+        counts[i] += 1
+        filled = max(0, filled - sizes[i])
+    return best[resolution], counts
+
+
+def plan_item(ingredient: dict, result: dict) -> dict:
+    """Packages to buy for one scaled ingredient from its ranked search candidates"""
+    need, need_unit = parse_quantity(ingredient.get('amount'), ingredient.get('unit', ''))
+    candidates = (result or {}).get('candidates') or []
+    # only products that really match are bought; failing that, a close best one
+    usable = [c for c in candidates if (c.get('score') or 0) >= MATCH_THRESHOLD]
+    if not usable and candidates and (candidates[0].get('score') or 0) >= FALLBACK_SCORE:
+        usable = candidates[:1]
+
+    options = []
+    for candidate in usable:
+        package = parse_package(candidate)
+        if not package['price']:
+            continue
+        amount, approx = package_amount(package['size'], package['unit'], need_unit, candidate.get('name'))
+        if amount and amount > 0:
+            options.append((candidate, package, amount, approx))
+
+    def bought(candidate, package, count):
+        return {
+            'item_id': candidate.get('item_id'),
+            'name': candidate.get('name'),
+            'url': candidate.get('url'),
+            'count': count,
+            'price': package['price'],
+            'size': package['size'],
+            'unit': package['unit']
+        }
+
+    if need and options:
+        cost, counts = cheapest_cover(need, [(amount, package['price']) for _, package, amount, _ in options])
+        packages = [bought(candidate, package, count)
+                    for (candidate, package, _, _), count in zip(options, counts) if count]
+        approximate = any(approx for (_, _, _, approx), count in zip(options, counts) if count)
+        return {'packages': packages, 'cost': round(cost, 2), 'covered': True, 'approximate': approximate}
+
+    # no usable size: price one of the best candidate that has a price
+    for candidate in usable:
+        package = parse_package(candidate)
+        if package['price']:
+            return {'packages': [bought(candidate, package, 1)], 'cost': round(package['price'], 2),
+                    'covered': False, 'approximate': True}
+    return {'packages': [], 'cost': None, 'covered': False, 'approximate': False}
+
+
+def plan_purchases(ingredients: list, results: list) -> dict:
+    """
+    Cheapest packages covering every scaled ingredient, and the total.
+
+    items lines up with ingredients; ingredients without a priced product
+    are left out of the total and listed in 'unpriced'.
+    """
+    items = [plan_item(ingredient, result) for ingredient, result in zip(ingredients, results)]
+    return {
+        'items': items,
+        'total': round(sum(item['cost'] for item in items if item['cost'] is not None), 2),
+        'unpriced': [ingredient.get('name') for ingredient, item in zip(ingredients, items)
+                     if item['cost'] is None]
+    }
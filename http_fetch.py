@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+
+class PageFetcher:
+    """
+    Shared HTTP fetch layer for recipe pages.
+
+    One requests.Session with a pooled adapter is reused for every fetch.
+    Transient failures are retried with exponential backoff. Bodies are
+    cached on disk gzip-compressed, and cached pages are revalidated with
+    If-None-Match / If-Modified-Since, so an unchanged page costs a 304 and
+    no body transfer.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = ".cache/pages", timeout: float = 15.0,
+                 retries: int = 3, backoff_factor: float = 0.5, pool_size: int = 16,
+                 retry_statuses: tuple = (429, 500, 502, 503, 504)):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_statuses,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {'network': 0, 'revalidated': 0, 'cache_errors': 0}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".html.gz"
+
+    def _load(self, url: str):
+        if not self.cache_dir:
+            return None, None
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with gzip.open(body_path, 'rt', encoding='utf-8') as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _store(self, url: str, response, text: str):
+        if not self.cache_dir:
+            return
+        meta_path, body_path = self._paths(url)
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        }
+        # write to temp files first so a crash never leaves a half-written entry;
+        # the names are unique per thread so concurrent fetches of a URL don't collide
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(body_path + suffix, 'wt', encoding='utf-8') as f:
+                f.write(text)
+            with open(meta_path + suffix, 'w') as f:
+                json.dump(meta, f)
+            os.replace(body_path + suffix, body_path)
+            os.replace(meta_path + suffix, meta_path)
+        except OSError as e:
+            print(f"Error caching {url}: {e}")
+            with self._lock:
+                self.stats['cache_errors'] += 1
+            for path in (body_path + suffix, meta_path + suffix):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def get_text(self, url: str, info: dict = None) -> str:
+        """
+        Fetch a page's text, revalidating any cached copy.
+
+        When info is given it is filled with the status, whether the cached
+        copy was revalidated, the retry count and the body size.
+        """
+        meta, cached_text = self._load(url)
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if info is not None:
+            retries = getattr(response.raw, 'retries', None)
+            info.update(status=response.status_code,
+                        retries=len(retries.history) if retries is not None else 0,
+                        revalidated=False)
+        if response.status_code == 304 and cached_text is not None:
+            with self._lock:
+                self.stats['revalidated'] += 1
+            if info is not None:
+                info.update(revalidated=True, bytes=len(cached_text))
+            return cached_text
+
+        response.raise_for_status()
+        with self._lock:
+            self.stats['network'] += 1
+        text = response.text
+        if info is not None:
+            info['bytes'] = len(text)
+        if response.headers.get('ETag') or response.headers.get('Last-Modified'):
+            self._store(url, response, text)
+        return text
+
+    def close(self):
+        self.session.close()
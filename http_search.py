@@ -0,0 +1,107 @@
+import json
+import re
+from urllib.parse import quote, urljoin
+
+import requests
+
+from http_fetch import PageFetcher
+from search_pool import THROTTLE_MARKERS, ThrottledError
+
+_NEXT_DATA = re.compile(
+    r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def _walk_items(node):
+    """Yield every dict in the page state that looks like a search result item"""
+    if isinstance(node, dict):
+        if node.get('usItemId') and node.get('name'):
+            yield node
+            return
+        for value in node.values():
+            yield from _walk_items(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk_items(value)
+
+
+def _price_text(item: dict):
+    """Price in the same text shape the result tiles show"""
+    info = item.get('priceInfo') or {}
+    current = info.get('linePrice') or info.get('itemPrice') or item.get('price')
+    if current is None:
+        return None
+    if isinstance(current, (int, float)):
+        current = f"${current:.2f}"
+    text = f"current price {current}"
+    if info.get('unitPrice'):
+        text += f"\n{info['unitPrice']}"
+    return text
+
+
+def parse_search_page(page_html: str, base_url: str) -> list:
+    """Result tiles ({item_id, name, url, price}) from a search page's __NEXT_DATA__ state"""
+    match = _NEXT_DATA.search(page_html)
+    if not match:
+        return []
+    try:
+        state = json.loads(match.group(1))
+    except ValueError:
+        return []
+
+    tiles = []
+    seen = set()
+    try:
+        stacks = state['props']['pageProps']['initialData']['searchResult']['itemStacks']
+        items = [item for stack in stacks for item in stack.get('items', [])]
+    except (KeyError, TypeError):
+        items = list(_walk_items(state))
+
+    for item in items:
+        item_id = item.get('usItemId')
+        if not item_id or not item.get('name') or item_id in seen:
+            continue
+        seen.add(item_id)
+        link = item.get('canonicalUrl')
+        tiles.append({
+            'item_id': str(item_id),
+            'name': item['name'],
+            'url': urljoin(base_url, link) if link else None,
+            'price': _price_text(item)
+        })
+    return tiles
+
+
+class HttpSearchBackend:
+    """
+    Product search over pooled HTTP, reading results from the page's embedded
+    JSON state. The fetcher should neither cache pages nor retry 429s (see
+    search_fetcher), so throttling reaches the caller's rate limiter at once.
+    """
+
+    def __init__(self, fetcher, base_url: str):
+        self.fetcher = fetcher
+        self.base_url = base_url.rstrip('/')
+
+    def search(self, search_query: str) -> list:
+        """Result tiles for a query; raises ThrottledError on a 429 or a bot-check page"""
+        url = f"{self.base_url}/search?q={quote(search_query)}"
+        try:
+            page_html = self.fetcher.get_text(url)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 429:
+                raise ThrottledError(f"throttled (429) searching for {search_query}") from e
+            raise
+        tiles = parse_search_page(page_html, self.base_url + '/')
+        if not tiles and any(marker in page_html[:5000].lower() for marker in THROTTLE_MARKERS):
+            raise ThrottledError(f"throttled searching for {search_query}")
+        return tiles
+
+
+def search_fetcher(**kwargs):
+    """
+    PageFetcher for search pages: no disk cache (results go to the search
+    cache and catalog instead) and no retry on 429
+    """
+    return PageFetcher(cache_dir=None, retry_statuses=(500, 502, 503, 504), **kwargs)
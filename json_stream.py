@@ -0,0 +1,94 @@
+import json
+
+
+class IngredientStreamParser:
+    """
+    Incremental parser for a streamed parse-prompt response.
+
+    Feed it completion chunks as they arrive. feed() returns each object of
+    the top-level "ingredients" array as soon as its closing brace arrives,
+    and top-level scalar fields (servings, meal_type, ...) are collected in
+    .fields as soon as they are complete. Only the bytes after the last
+    scanned position are looked at on each call.
+    """
+
+    def __init__(self, array_key: str = 'ingredients'):
+        self.array_key = array_key
+        self.fields = {}
+        self._text = ''
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._key = None
+        self._value_start = None
+        self._in_array = False
+        self._object_start = None
+
+    def feed(self, chunk: str) -> list:
+        """Consume a chunk and return any ingredient objects it completed"""
+        if not chunk:
+            return []
+        self._text += chunk
+        completed = []
+        text = self._text
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:pos]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ':' and len(self._stack) == 1:
+                self._key = json.loads(f'"{self._last_string}"')
+                self._value_start = pos + 1
+            elif char in '{[':
+                if char == '[' and len(self._stack) == 1 and self._key == self.array_key:
+                    self._in_array = True
+                elif char == '{' and self._in_array and len(self._stack) == 2:
+                    self._object_start = pos
+                self._stack.append(char)
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if char == '}' and self._in_array and len(self._stack) == 2 and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(text[self._object_start:pos + 1]))
+                    except ValueError:
+                        pass
+                    self._object_start = None
+                elif char == ']' and self._in_array and len(self._stack) == 1:
+                    self._in_array = False
+                    self._value_start = None
+                elif char == '}' and not self._stack:
+                    self._end_field(text, pos)
+            elif char == ',' and len(self._stack) == 1:
+                self._end_field(text, pos)
+        self._pos = len(text)
+        return completed
+
+    def _end_field(self, text: str, pos: int):
+        """Record a finished top-level scalar field"""
+        if self._value_start is None or self._key is None:
+            return
+        raw = text[self._value_start:pos].strip()
+        self._value_start = None
+        if raw and raw[0] not in '{[':
+            try:
+                self.fields[self._key] = json.loads(raw)
+            except ValueError:
+                pass
+
+    def result(self) -> dict:
+        """The full parsed document once the stream has ended"""
+        return json.loads(self._text)
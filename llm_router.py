@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+# token counts in the shape of the OpenAI usage object, whichever provider answered
+Usage = namedtuple("Usage", ["prompt_tokens", "completion_tokens"])
+
+
+class OpenAIProvider:
+    """Chat completions in JSON mode; honours OPENAI_BASE_URL like the OpenAI client does"""
+
+    name = "openai"
+    streams = True
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self.api_key or os.getenv('OPENAI_API_KEY'))
+        return self._client
+
+    def complete_json(self, model: str, prompt: str) -> tuple:
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={ "type": "json_object" }
+        )
+        return response.choices[0].message.content, response.usage
+
+
+class AnthropicProvider:
+    """Messages API; the reply is prefilled with "{" so it comes back as bare JSON"""
+
+    name = "anthropic"
+    streams = False
+
+    def __init__(self, api_key: str = None, max_tokens: int = 4096):
+        self.api_key = api_key
+        self.max_tokens = max_tokens
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import anthropic
+                    self._client = anthropic.Anthropic(api_key=self.api_key or os.getenv('ANTHROPIC_API_KEY'))
+        return self._client
+
+    def complete_json(self, model: str, prompt: str) -> tuple:
+        response = self.client.messages.create(
+            model=model,
+            max_tokens=self.max_tokens,
+            messages=[
+                {"role": "user", "content": f"{prompt}\n\nRespond with the JSON object only."},
+                {"role": "assistant", "content": "{"}
+            ]
+        )
+        text = "{" + "".join(block.text for block in response.content if getattr(block, 'type', None) == 'text')
+        return text, Usage(response.usage.input_tokens, response.usage.output_tokens)
+
+
+PROVIDERS = {
+    'openai': OpenAIProvider,
+    'anthropic': AnthropicProvider,
+}
+
+
+class Tier:
+    """One model on one provider, with its call statistics"""
+
+    def __init__(self, provider, model: str):
+        self.provider = provider
+        self.model = model
+        self.name = f"{provider.name}:{model}"
+        self.calls = 0
+        self.invalid = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'mean_seconds': round(self.seconds / self.calls, 3) if self.calls else None
+        }
+
+
+class Attempt:
+    """What one tier returned for a call: parsed JSON (or None), problems, usage and time"""
+
+    def __init__(self, tier: Tier, result, problems: list, usage, seconds: float, error: str = None):
+        self.tier = tier
+        self.result = result
+        self.problems = problems
+        self.usage = usage
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.problems
+
+
+def parse_tiers(spec: str) -> list:
+    """
+    Tiers from "provider:model,provider:model", fastest first. A bare model
+    name means OpenAI. Providers are shared between tiers that use them.
+    """
+    providers = {}
+    tiers = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        provider_name, _, model = entry.rpartition(':')
+        provider_name = provider_name or 'openai'
+        if provider_name not in PROVIDERS:
+            raise ValueError(f"unknown LLM provider {provider_name!r} in {entry!r}")
+        if provider_name not in providers:
+            providers[provider_name] = PROVIDERS[provider_name]()
+        tiers.append(Tier(providers[provider_name], model))
+    if not tiers:
+        raise ValueError("no LLM tiers configured")
+    return tiers
+
+
+class LLMRouter:
+    """
+    Sends each JSON completion to the fastest tier first and checks the
+    answer locally; only when it does not parse or fails validation does
+    the call move up to the next, larger model. When no tier produces a
+    valid answer the last parseable one is returned, so routing never does
+    worse than calling the largest model alone.
+
+    Keeps per-tier call counts, validation failures and latency, and how
+    many calls had to escalate.
+    """
+
+    def __init__(self, tiers: list):
+        self.tiers = tiers
+        self.requests = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: str):
+        return cls(parse_tiers(spec))
+
+    @property
+    def cache_key(self) -> str:
+        """Stands in for the model name in cache keys; changes whenever the tiers do"""
+        return "route:" + ",".join(tier.name for tier in self.tiers)
+
+    def stream_tier(self) -> Tier:
+        """Fastest tier whose provider can stream"""
+        return next((tier for tier in self.tiers if tier.provider.streams), self.tiers[-1])
+
+    def warm(self):
+        """Create every provider's client now rather than on the first call"""
+        for tier in self.tiers:
+            tier.provider.client
+
+    def attempt(self, tier: Tier, prompt: str, validate=None) -> Attempt:
+        started = time.monotonic()
+        error = None
+        result, problems, usage = None, [], None
+        try:
+            text, usage = tier.provider.complete_json(tier.model, prompt)
+            result = json.loads(text)
+            problems = validate(result) if validate is not None else []
+        except json.JSONDecodeError as e:
+            problems = [f"response is not JSON: {e}"]
+        except Exception as e:
+            error = str(e)
+        seconds = time.monotonic() - started
+        with self._lock:
+            tier.calls += 1
+            tier.seconds += seconds
+            tier.errors += error is not None
+            tier.invalid += bool(problems)
+        return Attempt(tier, result, problems, usage, seconds, error)
+
+    def complete_json(self, prompt: str, validate=None, on_attempt=None) -> Attempt:
+        """
+        Route one JSON completion. validate(result) returns a list of
+        problems (empty when the answer is usable); on_attempt(attempt) is
+        called after every tier tried. Raises when no tier returns JSON.
+        """
+        with self._lock:
+            self.requests += 1
+        answered = None
+        for index, tier in enumerate(self.tiers):
+            attempt = self.attempt(tier, prompt, validate)
+            if on_attempt is not None:
+                on_attempt(attempt)
+            if attempt.result is not None:
+                answered = attempt
+            last = index == len(self.tiers) - 1
+            if attempt.ok or (last and answered is not None):
+                if index:
+                    with self._lock:
+                        self.escalated += 1
+                return attempt if attempt.ok else answered
+            if last:
+                raise RuntimeError(attempt.error or "; ".join(attempt.problems))
+            print(f"{tier.name} answer rejected ({attempt.error or '; '.join(attempt.problems[:3])}), "
+                  f"escalating to {self.tiers[index + 1].name}")
+
+    def record_stream(self, tier: Tier, seconds: float, problems: list):
+        """Count a streamed call, which cannot escalate once its output has been used"""
+        with self._lock:
+            self.requests += 1
+            tier.calls += 1
+            tier.seconds += seconds
+            tier.invalid += bool(problems)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'escalated': self.escalated,
+                'escalation_rate': round(self.escalated / self.requests, 3) if self.requests else None,
+                'tiers': {tier.name: tier.stats() for tier in self.tiers}
+            }
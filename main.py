@@ -1,22 +1,70 @@
 import os
 from typing import Dict
 from urllib.parse import quote
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from openai import OpenAI
 import json
 import time
-from bs4 import BeautifulSoup
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from pipeline import BatchPipeline
+from llm_cache import LLMCache
+from scaling import scale_recipe_data
+from recipe_extract import extract_recipe
+from http_fetch import PageFetcher
+from search_pool import DriverPool, SearchPool, ThrottledError, is_throttled
+from product_search import extract_tiles, rank_tiles, score_product
+from matching import MATCH_THRESHOLD
+from search_cache import SearchCache
+from catalog import ProductCatalog
+from checkpoint import CheckpointStore
+from results import ResultWriter
+from cost_optimizer import plan_purchases
+from cart import BULK_ADD_URL, CartFiller, cart_count, cart_items, wait_for_cart_change
+from http_search import HttpSearchBackend, search_fetcher
+from json_stream import IngredientStreamParser
+from prompts import TokenUsage, compact_prompt, fit_recipe_text
+from metrics import StageTimer
+from llm_router import LLMRouter
+from schemas import batch_problems, recipe_problems, storage_tips_problems
+from records import Ingredient, RecordError, ScaledRecipe, coerce_matches, coerce_recipe
+from tracing import Tracer, profile_run
 
 load_dotenv()
 
 CLAUDE_2_1='claude-3-haiku-20240307'
-# MODELID="gpt-3.5-turbo"
+FAST_MODELID="gpt-3.5-turbo"
 MODELID="gpt-4-turbo-preview"
+# LLM calls go to the first tier and escalate only when its answer fails validation,
+# e.g. LLM_TIERS=anthropic:claude-3-haiku-20240307,openai:gpt-4-turbo-preview
+LLM_TIERS = os.getenv('LLM_TIERS') or f"openai:{FAST_MODELID},openai:{MODELID}"
+# Bump when a prompt template changes so cached responses are not reused
+PARSE_PROMPT_VERSION = "parse-v2"
+STORAGE_PROMPT_VERSION = "storage-v2"
+STREAM_PARSE_PROMPT_VERSION = "parse-stream-v2"
+BATCH_PARSE_PROMPT_VERSION = "parse-batch-v1"
+WALMART_BASE_URL = "https://www.walmart.com"
+INGREDIENT_GUIDE = compact_prompt("""For each ingredient provide:
+    - name: Use standard grocery shopping terms. Format specifically for Walmart grocery search (e.g., "garlic cloves" instead of "whole fresh garlic bulb", "sour cream" instead of just "dairy sour cream")
+    - amount: numerical quantity
+    - unit: Use common retail units:
+        - For produce: "whole", "bunch", "head", "lb"
+        - For dairy/liquid: "oz", "fl oz", "gallon"
+        - For packaged goods: "oz", "lb", "count"
+    - category: Specify one of: "produce", "dairy", "meat", "pantry", "spices"
+    - notes: Include any specifics that do not fit in the other details
+
+    Consider common Walmart packaging and product names. Format ingredient names as you would find them on Walmart.com.""")
+RECIPE_FIELDS = """- ingredients: array of ingredient objects
+- servings: number
+- meal_type: string
+- portion_size: string
+- calories_per_serving: number"""
+STREAM_RECIPE_FIELDS = """- servings: number
+- meal_type: string
+- portion_size: string
+- calories_per_serving: number
+- ingredients: array of ingredient objects"""
 # TODO: queries and item selection still arent great 
 # TODO: add query term to the debugging output
 # TODO: When searching can we run query, return top 3-5 items and figure out which is the most relevant
@@ -25,19 +73,97 @@ MODELID="gpt-4-turbo-preview"
 # TODO: shopping list has simplified terms while scaled ingredients have more complex terms 
 #   - join or fix so search has simpler terms that can be augmented based on infered category
 class RecipeAssistant:
-    def __init__(self, num_meals: int):
+    def __init__(self, num_meals: int, use_llm_cache: bool = True, search_workers: int = 1,
+                 use_search_cache: bool = True, use_catalog: bool = True):
         """
         Initialize the Recipe Assistant with Claude API key
         
         Args:
-            claude_api_key (str): Anthropic API key
+            num_meals (int): Number of meals to scale recipes for
+            use_llm_cache (bool): Reuse parse/scale responses from the on-disk cache
+            search_workers (int): Browser sessions used for parallel product search
+            use_search_cache (bool): Reuse ranked product candidates from earlier searches
+            use_catalog (bool): Answer searches from the local catalog of scraped products
         """
-        # Initialize Anthropic client with explicit API key
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # The LLM clients and browsers are created on first use so parse-only
+        # and scale-only jobs never import selenium or start Chrome
+        self.router = LLMRouter.from_spec(LLM_TIERS)
+        self.llm_cache = LLMCache() if use_llm_cache else None
+        self.fetcher = PageFetcher()
+        self.search_fetcher = search_fetcher()
         self.servings_needed = num_meals
         self.debug_walmart_search = False
-        self.driver = uc.Chrome()
-        self.driver.maximize_window()
+        self.include_storage_tips = False
+        # max tokens of recipe text sent to the parse prompt (0 disables the limit)
+        self.prompt_token_budget = 3000
+        # "two_call": parse, then a separate storage-tips call when tips are wanted
+        # "single_pass": storage tips come back with the parse in one call
+        # "batched": process_recipe_urls packs up to llm_batch_size recipes per parse call
+        self.llm_mode = "two_call"
+        self.llm_batch_size = 4
+        self.token_usage = TokenUsage()
+        self.timings = StageTimer()
+        # spans go to TRACE_FILE as JSON lines and/or to an OTLP/HTTP collector
+        # (e.g. OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318)
+        self.tracer = Tracer(path=os.getenv('TRACE_FILE'),
+                             otlp_endpoint=os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'))
+        self.search_top_k = 5
+        self.search_cache = SearchCache() if use_search_cache else None
+        self.stale_while_revalidate = True
+        self.catalog = ProductCatalog() if use_catalog else None
+        # every finished stage and searched ingredient is written here (None
+        # disables); with resume set a run skips whatever the previous run of
+        # the recipe finished, otherwise it starts the recipe's checkpoint over.
+        # Checkpoints expire after CheckpointStore.max_age
+        self.checkpoints = CheckpointStore()
+        self.resume = False
+        self._result_writers = {}
+        self._result_writers_lock = threading.Lock()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-refresh")
+        # (query, category) of stale entries with a background refresh pending
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        self.search_pool = SearchPool(DriverPool(self._new_driver, size=search_workers))
+        # "selenium" drives Chrome; "http" reads search pages over HTTP and
+        # falls back to the browser for anything it can't answer
+        self.search_backend = "selenium"
+        self.http_search_workers = 4
+        self.store_base_url = WALMART_BASE_URL
+        # cart stage: off by default; the bulk link is a template so a fake store can stand in
+        self.fill_cart = False
+        self.cart_bulk_url = BULK_ADD_URL
+        self.cart_url = "{base}/cart"
+
+    @property
+    def client(self):
+        """Client of the tier streamed parses use, created on first LLM call"""
+        return self.router.stream_tier().provider.client
+
+    def primary_driver(self):
+        """Borrow the primary browser session (started on first use) for a with block"""
+        return self.search_pool.drivers.primary()
+
+    def _new_driver(self):
+        """Start a browser session for searching"""
+        import undetected_chromedriver as uc
+        driver = uc.Chrome()
+        driver.maximize_window()
+        return driver
+
+    def warm_up(self, browsers: bool = True, login: bool = False):
+        """
+        Create the LLM clients and start every browser session now rather
+        than on the first job; with login, wait for a manual login in the
+        primary browser (the one the cart stage uses).
+        """
+        self.router.warm()
+        if browsers:
+            drivers = self.search_pool.drivers.warm()
+            print(f"Started {len(drivers)} browser session(s)")
+            if login:
+                with self.primary_driver() as driver:
+                    driver.get(self.store_base_url)
+                    self.wait_for_manual_login()
 
     def wait_for_manual_login(self):
         """Wait for user to manually log in to Walmart"""
@@ -46,291 +172,785 @@ class RecipeAssistant:
         input()
         print("Continuing with recipe processing...")
 
+    @contextmanager
+    def _stage(self, stage: str, **attributes):
+        """Time a pipeline stage and trace it as a span"""
+        with self.timings.time(stage), self.tracer.span(stage, **attributes) as span:
+            yield span
+
     def extract_recipe_text(self, recipe_url: str) -> str:
-        """Extract text content from recipe URL"""
-        response = requests.get(recipe_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        for script in soup(["script", "style"]):
-            script.decompose()
-            
-        return soup.get_text()
+        """Extract recipe text from URL, preferring the page's schema.org JSON-LD"""
+        with self._stage("fetch", url=recipe_url) as span:
+            info = {}
+            text = extract_recipe(self.fetcher.get_text(recipe_url, info))
+            span.set(chars=len(text), **info)
+            return text
 
     def parse_recipe_with_claude(self, recipe_text: str) -> list:
         """Use Claude to parse recipe ingredients"""
         try:
-            response = self.client.chat.completions.create(
-                model=MODELID,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"""Analyze this recipe and convert ingredients into Walmart-optimized shopping format.
-
-                        For each ingredient provide:
-                        - name: Use standard grocery shopping terms. Format specifically for Walmart grocery search (e.g., "garlic cloves" instead of "whole fresh garlic bulb", "sour cream" instead of just "dairy sour cream")
-                        - amount: numerical quantity
-                        - unit: Use common retail units:
-                            - For produce: "whole", "bunch", "head", "lb"
-                            - For dairy/liquid: "oz", "fl oz", "gallon"
-                            - For packaged goods: "oz", "lb", "count"
-                        - category: Specify one of: "produce", "dairy", "meat", "pantry", "spices"
-                        - notes: Include any specifics that do not fit in the other details
-
-                        Consider common Walmart packaging and product names. Format ingredient names as you would find them on Walmart.com.
-
-                        Format response as JSON with:
-                        - ingredients: array of ingredient objects
-                        - servings: number
-                        - meal_type: string
-                        - portion_size: string  
-                        - calories_per_serving: number
-
-                        Recipe text:
-                        {recipe_text}"""
-                    }
-                ],
-                response_format={ "type": "json_object" }
-            )
-            return json.loads(response.choices[0].message.content)
+            prompt = self._parse_prompt(recipe_text)
+            with self._stage("parse", llm_mode=self.llm_mode):
+                response = self._complete_json(PARSE_PROMPT_VERSION, prompt, validate=recipe_problems)
+            # typed and repaired here, so a bad field fails now rather than mid-search
+            return coerce_recipe(response)[0]
         except Exception as e:
             print(f"Error parsing ingredients: {e}")
             return []
 
+    def parse_recipes_batched(self, recipe_texts: list) -> list:
+        """
+        Parse several recipes in one LLM request.
+
+        The response is split back per recipe and each part is checked
+        (matching id, non-empty ingredient list with names); recipes whose
+        part is missing or malformed are re-parsed on their own. Returns one
+        parsed recipe per input text, in order.
+        """
+        if len(recipe_texts) == 1:
+            return [self.parse_recipe_with_claude(recipe_texts[0])]
+
+        sections = "\n\n".join(
+            f"=== Recipe {i} ===\n{compact_prompt(fit_recipe_text(text, self.prompt_token_budget, MODELID))}"
+            for i, text in enumerate(recipe_texts)
+        )
+        fields = "\n".join(f"    {line}" for line in RECIPE_FIELDS.splitlines())
+        prompt = "\n\n".join([
+            f"Analyze each of these {len(recipe_texts)} recipes and convert its ingredients "
+            f"into Walmart-optimized shopping format.",
+            INGREDIENT_GUIDE,
+            "Format response as JSON with one key:\n"
+            "- recipes: array with one object per recipe, in the same order, each with:\n"
+            "    - id: the number in the recipe's header\n" + fields,
+            f"Recipes:\n{sections}"
+        ])
+
+        parts = {}
+        try:
+            with self._stage("parse", llm_mode="batched", recipes=len(recipe_texts)):
+                response = self._complete_json(
+                    BATCH_PARSE_PROMPT_VERSION, prompt,
+                    validate=lambda result: batch_problems(result, len(recipe_texts))
+                )
+            for part in response.get('recipes', []):
+                if isinstance(part, dict) and isinstance(part.get('id'), (int, str)):
+                    parts[str(part['id'])] = part
+        except Exception as e:
+            print(f"Error parsing recipe batch: {e}")
+
+        parsed = []
+        for i, text in enumerate(recipe_texts):
+            part = parts.get(str(i))
+            recipe, _ = coerce_recipe(part)
+            # a part that lost ingredients to coercion is garbled; parse it alone
+            if recipe['ingredients'] and len(recipe['ingredients']) == len(part['ingredients']):
+                parsed.append(recipe)
+            else:
+                print(f"Recipe {i} missing or malformed in batch response, parsing it alone")
+                parsed.append(self.parse_recipe_with_claude(text))
+        return parsed
+
+    def _parse_prompt(self, recipe_text: str, stream: bool = False) -> str:
+        """Parse prompt; the streaming variant asks for the scalar fields before the ingredients"""
+        recipe_text = fit_recipe_text(recipe_text, self.prompt_token_budget, MODELID)
+        fields = STREAM_RECIPE_FIELDS if stream else RECIPE_FIELDS
+        if self.llm_mode == "single_pass" and self.include_storage_tips and not stream:
+            fields += "\n" + self._storage_tips_field()
+        intro = "with these keys, in this order:" if stream else "with:"
+        return "\n\n".join([
+            "Analyze this recipe and convert ingredients into Walmart-optimized shopping format.",
+            INGREDIENT_GUIDE,
+            f"Format response as JSON {intro}\n{fields}",
+            f"Recipe text:\n{compact_prompt(recipe_text)}"
+        ])
+
+    def _storage_tips_field(self) -> str:
+        return (f"- storage_tips: object mapping each ingredient name to storage advice "
+                f"when buying for {self.servings_needed} meals")
+
+    def stream_recipe_ingredients(self, recipe_text: str):
+        """
+        Parse a recipe with a streamed completion.
+
+        Yields (ingredient, fields) as soon as each ingredient object is
+        complete; fields holds the top-level values (servings, meal_type, ...)
+        received so far. The OpenAI client honours OPENAI_BASE_URL, so this can
+        run against a local server that streams chunked completions.
+        """
+        prompt = self._parse_prompt(recipe_text, stream=True)
+
+        def typed(ingredient):
+            try:
+                return Ingredient.coerce(ingredient).to_dict()
+            except RecordError as e:
+                print(f"Skipping streamed ingredient: {e}")
+                return None
+
+        if self.llm_cache is not None:
+            cached = self.llm_cache.get(self.router.cache_key, STREAM_PARSE_PROMPT_VERSION, prompt)
+            if cached is not None:
+                fields = {k: v for k, v in cached.items() if k != 'ingredients'}
+                for ingredient in filter(None, map(typed, cached.get('ingredients', []))):
+                    yield ingredient, fields
+                return
+
+        # ingredients are used as they arrive, so a streamed parse cannot
+        # escalate; it runs on the fastest tier that streams
+        tier = self.router.stream_tier()
+        parser = IngredientStreamParser()
+        started = time.monotonic()
+        with self.tracer.span("llm", model=tier.model, prompt_version=STREAM_PARSE_PROMPT_VERSION,
+                              stream=True, cache_hit=False) as span:
+            stream = tier.provider.client.chat.completions.create(
+                model=tier.model,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={ "type": "json_object" },
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            count = 0
+            for chunk in stream:
+                if getattr(chunk, 'usage', None):
+                    entry = self._record_usage(STREAM_PARSE_PROMPT_VERSION, chunk.usage,
+                                               time.monotonic() - started, model=tier.model)
+                    span.set(prompt_tokens=entry['prompt_tokens'],
+                             completion_tokens=entry['completion_tokens'])
+                if not chunk.choices:
+                    continue
+                for ingredient in filter(None, map(typed, parser.feed(chunk.choices[0].delta.content or ''))):
+                    count += 1
+                    if count == 1:
+                        span.set(first_ingredient_ms=round((time.monotonic() - started) * 1000, 1))
+                    yield ingredient, parser.fields
+            problems = recipe_problems(parser.result())
+            self.router.record_stream(tier, time.monotonic() - started, problems)
+            span.set(ingredients=count, valid=not problems)
+
+        if problems:
+            print(f"Streamed parse from {tier.name} failed validation: {'; '.join(problems[:3])}")
+        elif self.llm_cache is not None:
+            self.llm_cache.put(self.router.cache_key, STREAM_PARSE_PROMPT_VERSION, prompt, parser.result())
+
     def add_to_cart(self, search_query: str):
         """Search for and add item to cart"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         try:
-            self.driver.get(f"https://www.walmart.com/search?q={search_query}")
-            
-            # Wait for search results
-            item = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "[data-item-id]"))
-            )
-            
-            # Wait for and click Add to Cart button
-            add_button = WebDriverWait(item, 10).until(
-                EC.element_to_be_clickable((By.XPATH, ".//button[contains(text(), 'Add to cart')]"))
-            )
-            add_button.click()
-            
-            time.sleep(2)  # Wait for cart update
+            with self.primary_driver() as driver:
+                driver.get(f"{self.store_base_url}/search?q={quote(search_query)}")
+
+                # Wait for search results
+                item = WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "[data-item-id]"))
+                )
+
+                # Wait for and click Add to Cart button
+                add_button = WebDriverWait(item, 10).until(
+                    EC.element_to_be_clickable((By.XPATH, ".//button[contains(text(), 'Add to cart')]"))
+                )
+                before = cart_count(driver)
+                add_button.click()
+
+                # Wait for the cart badge to update
+                if not wait_for_cart_change(driver, before, 10):
+                    print(f"Cart count did not change after adding {search_query}")
             
         except Exception as e:
             print(f"Error adding {search_query} to cart: {e}")
 
+    def add_products_to_cart(self, shopping_results: list) -> list:
+        """
+        Add the chosen products (and package counts) to the cart in bulk.
+
+        Returns one report per item with 'added' (the full quantity went in),
+        'added_quantity', the method that worked ('bulk' or 'product_page')
+        and any error.
+        """
+        items = cart_items(shopping_results)
+        if not items:
+            return []
+        with self._stage("cart", items=len(items)) as span, self.primary_driver() as driver:
+            filler = CartFiller(driver, self.store_base_url,
+                                bulk_url=self.cart_bulk_url, cart_url=self.cart_url)
+            reports = filler.add(items)
+            added = sum(report['added'] for report in reports)
+            span.set(added=added, failed=len(reports) - added)
+        print(f"Added {added} of {len(reports)} items to the cart")
+        for report in reports:
+            if not report['added']:
+                print(f"- could not add {report.get('name')}: {report['error']}")
+        return reports
+
     def process_recipe_url(self, recipe_url: str):
         """Main function to process recipe and add to cart"""
-        # First navigate to Walmart and wait for manual login
-        # self.driver.get("https://www.walmart.com")
-        # self.wait_for_manual_login()
-        if self.debug_walmart_search:
-            scaled_data = None
-            with open('shopping_list.json', 'r') as f:
-                data = json.loads(f.read())
-            print(data)
-            scaled_data = data['scaled_recipe']
-            recipe_text = data['original_recipe']
-        else:
-            print("Extracting recipe text...")
-            recipe_text = self.extract_recipe_text(recipe_url)
+        with self.tracer.span("recipe", url=recipe_url):
+            checkpoint = self.checkpoint_for(recipe_url, start=True)
+            done = {}
+            if checkpoint is not None and self.resume:
+                done = {stage: checkpoint.load(stage) for stage in ("fetch", "parse", "scale", "search")}
+                if done['search'] is not None:
+                    print(f"Resuming {recipe_url}: already finished")
+                    self.estimate_costs(done['scale'], done['search'])
+                    return {
+                        'original_recipe': done['fetch'],
+                        'scaled_recipe': done['scale'],
+                        'walmart_products': done['search']
+                    }
+            # First navigate to Walmart and wait for manual login
+            # self.driver.get("https://www.walmart.com")
+            # self.wait_for_manual_login()
+            if self.debug_walmart_search:
+                scaled_data = None
+                with open('shopping_list.json', 'r') as f:
+                    data = json.loads(f.read())
+                print(data)
+                scaled_data = ScaledRecipe.coerce(data['scaled_recipe']).to_dict()
+                recipe_text = data['original_recipe']
+            elif done.get('scale') is not None:
+                print(f"Resuming {recipe_url} from its scaled recipe")
+                recipe_text = done['fetch']
+                scaled_data = done['scale']
+            else:
+                recipe_text = done.get('fetch')
+                if recipe_text is None:
+                    print("Extracting recipe text...")
+                    recipe_text = self.extract_recipe_text(recipe_url)
+                    self._save_checkpoint(checkpoint, "fetch", recipe_text)
 
-            # print("\nOriginal Recipe Information:")
-            # print("\nShopping List:")
-            # for item in recipe_text['shopping_list']:
-            #     print(f"- {item}")
+                # print("\nOriginal Recipe Information:")
+                # print("\nShopping List:")
+                # for item in recipe_text['shopping_list']:
+                #     print(f"- {item}")
             
-            print("Parsing ingredients with Claude...")
-            ingredients = self.parse_recipe_with_claude(recipe_text)
-            print(f"Found {len(ingredients)} ingredients")
+                ingredients = done.get('parse')
+                if ingredients is None:
+                    print("Parsing ingredients with Claude...")
+                    ingredients = self.parse_recipe_with_claude(recipe_text)
+                    if not ingredients or not ingredients.get('ingredients'):
+                        # nothing later is checkpointed, so a resume retries the parse
+                        raise ValueError(f"no ingredients parsed from {recipe_url}")
+                    self._save_checkpoint(checkpoint, "parse", ingredients)
+                print(f"Found {len(ingredients['ingredients'])} ingredients")
             
-            # Calculate total meals needed
-            print(f"\nScaling recipe for {self.servings_needed} meals...")
-            scaled_data = self.scale_recipe(ingredients)
-            print("\nScaled Recipe Information:")
-            print("\nShopping List:")
-            for item in scaled_data['shopping_list']:
-                print(f"- {item}")
-
-            print("\nStorage Tips:")
-            for ingredient, tip in scaled_data['storage_tips'].items():
-                print(f"- {ingredient}: {tip}")
-            
-            print(f"\nEstimated Total Cost: ${scaled_data['estimated_cost']:.2f}")
+                # Calculate total meals needed
+                print(f"\nScaling recipe for {self.servings_needed} meals...")
+                scaled_data = self.scale_recipe(ingredients)
+                self._save_checkpoint(checkpoint, "scale", scaled_data)
+                print("\nScaled Recipe Information:")
+                print("\nShopping List:")
+                for item in scaled_data['shopping_list']:
+                    print(f"- {item}")
 
-        print("\nSearching Walmart for ingredients...")
-        shopping_results = []
+                print("\nStorage Tips:")
+                for ingredient, tip in scaled_data['storage_tips'].items():
+                    print(f"- {ingredient}: {tip}")
 
-        for ingredient in scaled_data['scaled_ingredients']:
-            print(f"Searching for {ingredient['name']}...")
-            result = self.search_walmart_product(ingredient)
-            shopping_results.append(result)
-            time.sleep(2)  # Prevent rate limiting
-
-        # print("Adding items to cart...")
-        # for item in ingredients:
-        #     search_query = f"{item.get('amount', '')} {item.get('unit', '')} {item['name']}".strip()
-        #     print(f"Adding {item['name']} to cart...")
-        #     self.add_to_cart(search_query)
-        #     time.sleep(2)
+            print("\nSearching Walmart for ingredients...")
+            shopping_results = self.search_ingredients(scaled_data['scaled_ingredients'],
+                                                       checkpoint=checkpoint)
+            self.estimate_costs(scaled_data, shopping_results)
+            if scaled_data['estimated_cost'] is not None:
+                print(f"\nEstimated Total Cost: ${scaled_data['estimated_cost']:.2f}")
+            if shopping_results and all(self.search_succeeded(result) for result in shopping_results):
+                self._save_checkpoint(checkpoint, "search", shopping_results)
+
+            result = {
+                'original_recipe': recipe_text,
+                'scaled_recipe': scaled_data,
+                'walmart_products': shopping_results
+            }
+            if self.fill_cart:
+                print("Adding items to cart...")
+                result['cart'] = self.add_products_to_cart(shopping_results)
+            return result
+
+    def process_recipe_url_streaming(self, recipe_url: str) -> dict:
+        """
+        Process a recipe with parsing, scaling and search pipelined.
+
+        Each ingredient is scaled and sent to product search as soon as the
+        streamed parse completes it, instead of after the whole response.
+        """
+        print("Extracting recipe text...")
+        recipe_text = self.extract_recipe_text(recipe_url)
+
+        print("Streaming ingredients from the LLM...")
+        started = time.monotonic()
+        ingredients = []
+        pending = []
+        futures = []
+        fields = {}
+
+        def submit(executor, ingredient: dict):
+            scaled = scale_recipe_data(
+                {'servings': fields.get('servings'), 'ingredients': [ingredient]},
+                self.servings_needed
+            )['scaled_ingredients'][0]
+            future = executor.submit(self.tracer.bind(self.search_ingredients), [scaled])
+            if not futures:
+                future.add_done_callback(lambda f: print(
+                    f"First search result after {time.monotonic() - started:.1f}s"))
+            futures.append(future)
+
+        workers = max(self.search_pool.drivers.size, self.http_search_workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stream-search") as executor:
+            try:
+                for ingredient, seen_fields in self.stream_recipe_ingredients(recipe_text):
+                    fields = seen_fields
+                    ingredients.append(ingredient)
+                    # scaling needs the recipe's servings; hold ingredients until it arrives
+                    if 'servings' not in fields:
+                        pending.append(ingredient)
+                        continue
+                    for waiting in pending:
+                        submit(executor, waiting)
+                    pending = []
+                    submit(executor, ingredient)
+            except Exception as e:
+                print(f"Error parsing ingredients: {e}")
+            for waiting in pending:
+                submit(executor, waiting)
+            shopping_results = [future.result()[0] for future in futures]
+
+        print(f"Found {len(ingredients)} ingredients")
+        scaled_data = self.scale_recipe(dict(fields, ingredients=ingredients))
+        self.estimate_costs(scaled_data, shopping_results)
         return {
             'original_recipe': recipe_text,
             'scaled_recipe': scaled_data,
             'walmart_products': shopping_results
         }
 
+    def search_ingredients(self, ingredients: list, checkpoint=None) -> list:
+        """
+        Search Walmart for each ingredient, keeping input order
+
+        Args:
+            ingredients (list): Scaled ingredients
+            checkpoint (RecipeCheckpoint): Saves each successful search as it
+                completes; with resume set, saved results are reused
+        """
+        with self._stage("search", ingredients=len(ingredients)):
+            return self._search_ingredients(ingredients, checkpoint)
+
+    def _search_ingredients(self, ingredients: list, checkpoint=None) -> list:
+        """
+        Ingredients with a checkpointed or cached search are answered without
+        touching the browser. With the "http" backend the rest are tried over
+        HTTP first; whatever is left is searched across the browser pool.
+        """
+        resumed = checkpoint.search_results() if checkpoint is not None and self.resume else {}
+        results = [resumed.get(checkpoint.ingredient_key(ingredient)) if resumed else None
+                   for ingredient in ingredients]
+        for i, ingredient in enumerate(ingredients):
+            if results[i] is None:
+                results[i] = self._cached_search(ingredient)
+        misses = [i for i, result in enumerate(results) if result is None]
+        cache_hits = len(ingredients) - len(misses)
+        if misses and self.catalog is not None:
+            for i in misses:
+                results[i] = self._catalog_search(ingredients[i])
+            misses = [i for i in misses if results[i] is None]
+        span = self.tracer.current_span()
+        if span is not None:
+            span.set(cache_hits=cache_hits,
+                     catalog_hits=len(ingredients) - cache_hits - len(misses))
+        if misses and self.search_backend == "http":
+            with ThreadPoolExecutor(max_workers=self.http_search_workers,
+                                    thread_name_prefix="http-search") as executor:
+                search_http = self._checkpointed(self.search_http_product, checkpoint)
+                http_results = list(executor.map(self.tracer.bind(search_http),
+                                                 [ingredients[i] for i in misses]))
+            for i, result in zip(misses, http_results):
+                results[i] = result
+            misses = [i for i in misses if results[i] is None]
+        live = self.search_pool.search_all(
+            [ingredients[i] for i in misses],
+            self.tracer.bind(self._checkpointed(self.search_walmart_product, checkpoint)),
+            on_error=lambda ingredient, e: self._search_failed(ingredient, e)
+        )
+        for i, result in zip(misses, live):
+            results[i] = result
+        return results
+
+    def _checkpointed(self, search_fn, checkpoint):
+        """Wrap a search function so successful results are checkpointed as they complete"""
+        if checkpoint is None:
+            return search_fn
+
+        def search(ingredient: dict, *args):
+            result = search_fn(ingredient, *args)
+            if result is not None and self.search_succeeded(result):
+                try:
+                    checkpoint.save_search(ingredient, result)
+                except OSError as e:
+                    print(f"Error checkpointing search for {ingredient['name']}: {e}")
+            return result
+        return search
+
+    @staticmethod
+    def search_succeeded(result: dict) -> bool:
+        return result.get('product', {}).get('url') not in (None, "URL not found")
+
+    def checkpoint_for(self, recipe_url: str, start: bool = False):
+        """
+        Checkpoint for a recipe run, or None when checkpointing is off or
+        unavailable. Checkpoints are always written so a crashed run can be
+        resumed; start=True (at the beginning of a recipe) without resume
+        drops what an earlier run left behind.
+        """
+        if self.checkpoints is None:
+            return None
+        try:
+            if start and not self.resume:
+                self.checkpoints.clear(recipe_url, self.servings_needed)
+            return self.checkpoints.for_recipe(recipe_url, self.servings_needed)
+        except OSError as e:
+            print(f"Error opening checkpoint for {recipe_url}: {e}")
+            return None
+
+    def _save_checkpoint(self, checkpoint, stage: str, value):
+        if checkpoint is None:
+            return
+        try:
+            checkpoint.save(stage, value)
+        except OSError as e:
+            print(f"Error checkpointing {stage} stage: {e}")
+
+    def _cached_search(self, ingredient: dict):
+        """Result from the search cache, or None when the browser is needed"""
+        if self.search_cache is None:
+            return None
+        search_query = self.build_search_query(ingredient)
+        candidates, fresh = self.search_cache.lookup(search_query, ingredient.get('category', ''))
+        if candidates is None or (not fresh and not self.stale_while_revalidate):
+            return None
+        if not fresh:
+            key = (search_query, ingredient.get('category', ''))
+            with self._refreshing_lock:
+                pending = key in self._refreshing
+                self._refreshing.add(key)
+            if pending:
+                print(f"Using cached results for {search_query}, refresh already pending")
+            else:
+                print(f"Using cached results for {search_query}, refreshing in background")
+                self._refresh_executor.submit(self._refresh_search, ingredient, key)
+        # re-score with the current matcher; the entry may have been ranked for another ingredient name
+        candidates = rank_tiles(candidates, ingredient, top_k=self.search_top_k)
+        return self._product_result(ingredient, candidates)
+
+    def _refresh_search(self, ingredient: dict, key: tuple):
+        """
+        Background re-search of a stale cache entry, over HTTP first when that
+        is the backend, like _search_ingredients; the search itself stores the
+        fresh result
+        """
+        try:
+            if self.search_backend == "http" and self.search_http_product(ingredient) is not None:
+                return
+            self.search_pool.search_all(
+                [ingredient],
+                self.search_walmart_product,
+                lambda ingredient, e: self._search_failed(ingredient, e)
+            )
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(key)
+
+    def _catalog_search(self, ingredient: dict):
+        """Result from the local product catalog, or None when the store has to be searched"""
+        candidates = self.catalog.lookup(ingredient, top_k=self.search_top_k)
+        if candidates is None:
+            return None
+        print(f"Found {ingredient['name']} in the local catalog: {candidates[0]['name']}")
+        return self._product_result(ingredient, candidates)
+
+    def _search_failed(self, ingredient: dict, error: Exception) -> dict:
+        print(f"Error searching for {ingredient['name']}: {error}")
+        return {
+            "ingredient": ingredient,
+            "product": {
+                "name": "Search failed",
+                "url": "URL not found",
+                "price": "Price not found",
+                "quantity_needed": f"{ingredient['amount']} {ingredient['unit'] or None}"
+            }
+        }
+
+    def process_recipe_urls(self, recipe_urls: list, fetch_workers: int = 8,
+                            llm_workers: int = 4, search_workers: int = 1,
+                            aggregate: bool = False, results_path: str = None,
+                            on_result=None, on_stage=None) -> list:
+        """
+        Process many recipe URLs with fetch, parse, scale and search overlapping.
+
+        Args:
+            recipe_urls (list): Recipe page URLs
+            fetch_workers (int): Concurrent page fetches
+            llm_workers (int): Concurrent parse/scale LLM calls
+            search_workers (int): Recipes searched at once; they share the browser pool
+            aggregate (bool): Merge ingredients across recipes and search each once
+            results_path (str): Append each recipe to this JSONL file as soon as
+                it finishes; the returned records then drop the page text
+            on_result (callable): Called with each recipe's record as it finishes
+            on_stage (callable): Called with (url, stage) as each stage finishes
+
+        Returns:
+            list: One result per URL, in input order. Failed recipes carry
+            'error' and 'stage' instead of products.
+        """
+        pipeline = BatchPipeline(
+            self,
+            fetch_workers=fetch_workers,
+            llm_workers=llm_workers,
+            search_workers=search_workers,
+            aggregate=aggregate
+        )
+        if results_path is None:
+            return pipeline.run(recipe_urls, on_result=on_result, on_stage=on_stage)
+
+        def write(record: dict):
+            self.save_results(record, results_path)
+            record.pop('original_recipe', None)
+            if on_result is not None:
+                on_result(record)
+        return pipeline.run(recipe_urls, on_result=write, on_stage=on_stage)
+
     def cleanup(self):
-        """Close the browser"""
-        self.driver.quit()
+        """Close the browsers"""
+        print(f"LLM tokens: {self.token_usage.totals()}")
+        print(f"LLM routing: {self.router.stats()}")
+        if self.llm_cache is not None:
+            print(f"LLM cache: {self.llm_cache.stats()}")
+            self.llm_cache.close()
+        self.fetcher.close()
+        self.search_fetcher.close()
+        self.tracer.close()
+        with self._result_writers_lock:
+            for writer in self._result_writers.values():
+                writer.close()
+            self._result_writers = {}
+        # let background refreshes finish before their browsers go away
+        self._refresh_executor.shutdown(wait=True)
+        if self.search_cache is not None:
+            print(f"Search cache: {self.search_cache.stats()}")
+            self.search_cache.close()
+        if self.catalog is not None:
+            print(f"Product catalog: {self.catalog.stats()}")
+            self.catalog.close()
+        self.search_pool.drivers.close()
 
     def scale_recipe(self, recipe_data: dict) -> dict:
         """
         Scale recipe ingredients for desired number of meals.
+
+        Amounts are scaled and rounded locally; the LLM is only asked for
+        storage tips when include_storage_tips is set and the parse did not
+        already return them (single_pass mode).
+        """
+        with self._stage("scale", servings=self.servings_needed):
+            scaled_data = scale_recipe_data(recipe_data, self.servings_needed)
+        parsed_tips = recipe_data.get('storage_tips') if isinstance(recipe_data, dict) else None
+        if self.include_storage_tips and isinstance(parsed_tips, dict) and parsed_tips:
+            scaled_data['storage_tips'] = parsed_tips
+        elif self.include_storage_tips and scaled_data['shopping_list']:
+            scaled_data['storage_tips'] = self.get_storage_tips(scaled_data['shopping_list'])
+        return scaled_data
+
+    def estimate_costs(self, scaled_data: dict, shopping_results: list) -> dict:
         """
-        response = self.client.chat.completions.create(
-            model=MODELID,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""Scale this recipe to make {self.servings_needed} meals.
-                    
-                    Current recipe data:
-                    {json.dumps(recipe_data, indent=2)}
-                    
-                    Calculate the new quantities needed and provide:
-                    1. Scaled ingredients list with adjusted amounts
-                    2. Shopping list optimized for bulk buying
-                    3. Storage recommendations for bulk ingredients
-                    4. Estimated total cost
-                    
-                    Format as JSON with these keys:
-                    - scaled_ingredients: array of adjusted ingredients
-                    - shopping_list: array of optimized items to buy and each item has the following fields: name, amount, units, notes
-                    - storage_tips: object with storage advice
-                    - estimated_cost: number
-                    
+        Price the cheapest packages covering each scaled ingredient.
+
+        Each search result gets a 'purchase' entry (packages, counts, cost) and
+        scaled_data['estimated_cost'] is set to the total.
+        """
+        with self._stage("cost", ingredients=len(shopping_results)) as span:
+            plan = plan_purchases(scaled_data.get('scaled_ingredients', []), shopping_results)
+            for result, item in zip(shopping_results, plan['items']):
+                result['purchase'] = item
+            scaled_data['estimated_cost'] = plan['total'] if shopping_results else None
+            span.set(total=plan['total'], unpriced=len(plan['unpriced']))
+        return plan
+
+    def get_storage_tips(self, shopping_list: list) -> dict:
+        """Ask the LLM for storage advice on the items being bought"""
+        items = [f"{item['amount']} {item['unit']} {item['name']}".strip() for item in shopping_list]
+        prompt = f"""Give short storage advice for these groceries bought for {self.servings_needed} meals.
+
+                    Items:
+                    {json.dumps(items, separators=(',', ':'))}
+
+                    Format as JSON with one key:
+                    - storage_tips: object mapping item name to storage advice
+
                     Consider:
-                    - Rounding to practical purchase amounts
                     - Bulk packaging sizes
-                    - Common store quantities
                     - Ingredient shelf life"""
-                }
-            ],
-            response_format={ "type": "json_object" }
-        )
-        
-        return json.loads(response.choices[0].message.content)
+        prompt = compact_prompt(prompt)
+        try:
+            return self._complete_json(STORAGE_PROMPT_VERSION, prompt,
+                                       validate=storage_tips_problems).get('storage_tips', {})
+        except Exception as e:
+            print(f"Error getting storage tips: {e}")
+            return {}
+
+    def _record_usage(self, kind: str, usage, seconds: float = 0.0, model: str = MODELID):
+        """Log and keep the token counts the API reported for a call"""
+        if usage is None:
+            return None
+        entry = self.token_usage.record(kind, model, usage.prompt_tokens,
+                                        usage.completion_tokens, seconds=seconds)
+        print(f"LLM {kind} ({model}): {entry['prompt_tokens']} prompt + "
+              f"{entry['completion_tokens']} completion tokens in {seconds:.1f}s")
+        return entry
+
+    def _complete_json(self, prompt_version: str, prompt: str, validate=None) -> dict:
+        """
+        Run a JSON-mode completion through the model tiers, served from the
+        LLM cache when possible. validate(result) lists what is wrong with
+        an answer; any problem sends the call on to the next tier.
+        """
+        route = self.router.cache_key
+        with self.tracer.span("llm", route=route, prompt_version=prompt_version) as span:
+            if self.llm_cache is not None:
+                cached = self.llm_cache.get(route, prompt_version, prompt)
+                if cached is not None:
+                    self.token_usage.record(prompt_version, route, 0, 0, cached=True)
+                    span.set(cache_hit=True)
+                    return cached
+
+            usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+
+            def on_attempt(attempt):
+                entry = self._record_usage(prompt_version, attempt.usage, attempt.seconds,
+                                           model=attempt.tier.model)
+                if entry is not None:
+                    usage['prompt_tokens'] += entry['prompt_tokens']
+                    usage['completion_tokens'] += entry['completion_tokens']
+
+            attempt = self.router.complete_json(prompt, validate=validate, on_attempt=on_attempt)
+            span.set(cache_hit=False, prompt_chars=len(prompt), model=attempt.tier.model,
+                     valid=attempt.ok, **usage)
+            result = attempt.result
 
-    def search_walmart_product(self, ingredient: dict) -> dict:
+        if attempt.ok and self.llm_cache is not None:
+            self.llm_cache.put(route, prompt_version, prompt, result)
+        elif not attempt.ok:
+            print(f"LLM {prompt_version} answer still invalid after escalation: "
+                  f"{'; '.join(attempt.problems[:3])}")
+        return result
+
+    def build_search_query(self, ingredient: dict) -> str:
+        """Build the Walmart search query for an ingredient"""
+        # Construct more specific search queries based on category
+        category = ingredient.get('category', '').lower()
+        name = ingredient['name']
+        unit = ingredient.get('unit', '')
+        notes = ingredient.get('notes', '')
+
+        if category == 'produce':
+            search_query = f"fresh {name}"
+        elif category == 'dairy':
+            search_query = f"dairy {name}"
+        elif category == 'meat':
+            search_query = f"fresh {name}"
+        elif category == 'spices':
+            search_query = f"{name} spice"
+        else:
+            search_query = name
+
+        # Add notes if they exist (like "organic")
+        # if notes:
+        #     search_query = f"{notes} {search_query}"
+
+        # Add department filter for more accurate results
+        # if category == 'produce':
+        #     url = f"https://www.walmart.com/browse/food/fresh-fruits-vegetables/{search_query}"
+        # elif category == 'dairy':
+        #     url = f"https://www.walmart.com/browse/food/dairy-eggs/{search_query}"
+        # else:
+        #     url = f"https://www.walmart.com/search?q={quote(search_query)}"
+
+        # Construct search query
+        # search_query = f"{ingredient['name']} {ingredient['unit']}"
+        # search_query = f"{ingredient['amount']} {ingredient['unit']} {ingredient['name']}"
+        return search_query
+
+    def search_http_product(self, ingredient: dict):
+        """Search for an ingredient without a browser; None means fall back to Selenium"""
+        search_query = self.build_search_query(ingredient)
+        limiter = self.search_pool.limiter
+        with self.tracer.span("http.search", query=search_query) as span:
+            try:
+                limiter.acquire()
+                tiles = HttpSearchBackend(self.search_fetcher, self.store_base_url).search(search_query)
+            except ThrottledError as e:
+                limiter.on_throttle()
+                span.set(throttled=True)
+                print(f"HTTP search throttled for {search_query}, falling back to browser: {e}")
+                return None
+            except Exception as e:
+                span.set(failed=str(e))
+                print(f"HTTP search failed for {search_query}, falling back to browser: {e}")
+                return None
+            span.set(tiles=len(tiles))
+        if not tiles:
+            return None
+        limiter.on_success()
+        if self.catalog is not None:
+            self.catalog.add(tiles, ingredient.get('category', ''))
+
+        candidates = rank_tiles(tiles, ingredient, top_k=self.search_top_k)
+        if self.search_cache is not None:
+            self.search_cache.store(search_query, ingredient.get('category', ''), candidates)
+        return self._product_result(ingredient, candidates)
+
+    def search_walmart_product(self, ingredient: dict, driver=None) -> dict:
         """Search for a single ingredient on Walmart.com and return product info."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        if driver is None:
+            with self.search_pool.drivers.driver() as driver:
+                return self.search_walmart_product(ingredient, driver)
+        tracer = self.tracer
         try:
-            # Construct more specific search queries based on category
-            category = ingredient.get('category', '').lower()
-            name = ingredient['name']
-            unit = ingredient.get('unit', '')
-            notes = ingredient.get('notes', '')
-
-            if category == 'produce':
-                search_query = f"fresh {name}"
-            elif category == 'dairy':
-                search_query = f"dairy {name}"
-            elif category == 'meat':
-                search_query = f"fresh {name}"
-            elif category == 'spices':
-                search_query = f"{name} spice"
-            else:
-                search_query = name
-
-            # Add notes if they exist (like "organic")
-            # if notes:
-            #     search_query = f"{notes} {search_query}"
-
-            # Add department filter for more accurate results
-            # if category == 'produce':
-            #     url = f"https://www.walmart.com/browse/food/fresh-fruits-vegetables/{search_query}"
-            # elif category == 'dairy':
-            #     url = f"https://www.walmart.com/browse/food/dairy-eggs/{search_query}"
-            # else:
-            #     url = f"https://www.walmart.com/search?q={quote(search_query)}"
-
-            # Construct search query
-            # search_query = f"{ingredient['name']} {ingredient['unit']}"
-            # search_query = f"{ingredient['amount']} {ingredient['unit']} {ingredient['name']}"
+            print(f"Searching for {ingredient['name']}...")
+            search_query = self.build_search_query(ingredient)
             encoded_query = quote(search_query)
-            url = f"https://www.walmart.com/search?q={encoded_query}"
+            url = f"{self.store_base_url}/search?q={encoded_query}"
             
-            self.driver.get(url)
-            time.sleep(2)  # Allow page to load
+            with tracer.span("browser.get", query=search_query, url=url):
+                driver.get(url)
+            if is_throttled(driver):
+                raise ThrottledError(f"throttled searching for {search_query}")
             
             # Wait for product grid to load
-            product = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-item-id]"))
-            )
+            with tracer.span("browser.wait", query=search_query):
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-item-id]"))
+                )
             
             try:
-                # Try multiple possible selectors for product name and URL
-                product_name = None
-                product_url = None
-                price = None
-                
-                # Get product name
-                name_selectors = [
-                    "span[data-automation-id='product-title']",
-                    "span.normal",
-                    "span.f6"
-                ]
-                for selector in name_selectors:
-                    try:
-                        product_name = product.find_element(By.CSS_SELECTOR, selector).text
-                        if self.is_valid_product(product_name, ingredient):
-                            break
-                    except:
-                        continue
-                
-                # Get product URL
-                try:
-                    # First try to get the main product link
-                    link_element = product.find_element(By.CSS_SELECTOR, "a[href*='/ip/']")
-                    product_url = link_element.get_attribute('href')
-                except:
-                    try:
-                        # Backup: try to get any link that contains '/ip/'
-                        links = product.find_elements(By.TAG_NAME, "a")
-                        for link in links:
-                            href = link.get_attribute('href')
-                            if href and '/ip/' in href:
-                                product_url = href
-                                break
-                    except:
-                        pass
-                
-                # Get price
-                price_selectors = [
-                    "[data-automation-id='product-price']",
-                    "div.price-main",
-                    "span.price"
-                ]
-                for selector in price_selectors:
-                    try:
-                        price = product.find_element(By.CSS_SELECTOR, selector).text
-                        if price:
-                            break
-                    except:
-                        continue
+                # Pull every tile in one round trip and keep the best matches
+                with tracer.span("browser.extract", query=search_query) as span:
+                    tiles = extract_tiles(driver)
+                    if self.catalog is not None:
+                        self.catalog.add(tiles, ingredient.get('category', ''))
+                    candidates = rank_tiles(tiles, ingredient, top_k=self.search_top_k)
+                    best = candidates[0] if candidates else {}
+                    span.set(candidates=len(candidates), best=best.get('name'), score=best.get('score'))
                 
                 # Print debug information
-                print(f"\nDebug info for {ingredient['name']}:")
-                print(f"Name found: {product_name}")
-                print(f"URL found: {product_url}")
-                print(f"Price found: {price}")
+                print(f"\nDebug info for {ingredient['name']} (query: {search_query}):")
+                print(f"Name found: {best.get('name')} (score {best.get('score')})")
+                print(f"URL found: {best.get('url')}")
+                print(f"Price found: {best.get('price')}")
                 
-                return {
-                    "ingredient": ingredient,
-                    "product": {
-                        "name": product_name or "Name not found",
-                        "url": product_url or "URL not found",
-                        "price": price or "Price not found",
-                        "quantity_needed": f"{ingredient['amount']} {ingredient['unit'] or ''}"
-                    }
-                }
+                if self.search_cache is not None and candidates:
+                    self.search_cache.store(search_query, ingredient.get('category', ''), candidates)
+                return self._product_result(ingredient, candidates)
                 
             except Exception as e:
                 print(f"Error extracting product details for {ingredient['name']}: {e}")
@@ -344,6 +964,8 @@ class RecipeAssistant:
                     }
                 }
                 
+        except ThrottledError:
+            raise
         except Exception as e:
             print(f"Error searching for {ingredient['name']}: {e}")
             return {
@@ -356,34 +978,50 @@ class RecipeAssistant:
                 }
             }
 
+    def _product_result(self, ingredient: dict, candidates: list) -> dict:
+        """Result entry for an ingredient from its ranked candidates"""
+        matches = coerce_matches(candidates)
+        best = matches[0] if matches else None
+        quantity = [str(part) for part in (ingredient.get('amount'), ingredient.get('unit'))
+                    if part not in (None, '')]
+        return {
+            "ingredient": ingredient,
+            "product": {
+                "name": best.name if best else "Name not found",
+                "url": (best and best.url) or "URL not found",
+                "price": (best and best.price) or "Price not found",
+                "item_id": best.item_id if best else None,
+                "quantity_needed": " ".join(quantity)
+            },
+            "candidates": [match.to_dict() for match in matches]
+        }
+
     def save_results(self, results: Dict, filename: str = "shopping_list.json"):
-        """Save results to a JSON file."""
-        with open(filename, 'w') as f:
-            json.dump(results, f, indent=2)
+        """
+        Save results to a JSON file.
+
+        A .jsonl or .jsonl.gz filename appends the results instead, as compact
+        records with the page text stored separately by content hash (see
+        results.ResultWriter / ResultReader).
+        """
+        with self._stage("save", filename=filename):
+            if filename.endswith(('.jsonl', '.jsonl.gz')):
+                self._result_writer(filename).write(results)
+            else:
+                with open(filename, 'w') as f:
+                    json.dump(results, f, indent=2)
         print(f"\nResults saved to {filename}")
 
+    def _result_writer(self, path: str) -> ResultWriter:
+        with self._result_writers_lock:
+            if path not in self._result_writers:
+                self._result_writers[path] = ResultWriter(path)
+            return self._result_writers[path]
+
     def is_valid_product(self, product_name: str, ingredient: dict) -> bool:
         """Validate if the found product matches what we're looking for"""
-        category = ingredient.get('category', '').lower()
-        name = ingredient['name'].lower()
-        
-        # Reject if product name contains certain keywords
-        invalid_keywords = {
-            'produce': ['seeds', 'plant', 'garden', 'growing'],
-            'dairy': ['chips', 'snacks', 'artificial'],
-            'meat': ['pet', 'dog', 'cat', 'toy']
-        }
-        
-        # Check category-specific invalid keywords
-        if category in invalid_keywords:
-            if any(kw in product_name.lower() for kw in invalid_keywords[category]):
-                return False
-        
-        # Verify product name contains main ingredient name
-        if name not in product_name.lower():
-            return False
-            
-        return True
+        return score_product(product_name, ingredient) >= MATCH_THRESHOLD
+
 # Example usage
 if __name__ == "__main__":
     assistant = RecipeAssistant(num_meals=7)
@@ -391,7 +1029,9 @@ if __name__ == "__main__":
     recipe_url = "https://www.bonappetit.com/recipe/loaded-scalloped-potatoes"
     
     try:
-        results = assistant.process_recipe_url(recipe_url)
+        # PROFILE=cprofile|sampling profiles the run, written to PROFILE_OUTPUT
+        with profile_run(os.getenv('PROFILE'), os.getenv('PROFILE_OUTPUT')):
+            results = assistant.process_recipe_url(recipe_url)
         # Save results
         assistant.save_results(results)
         
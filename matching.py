@@ -0,0 +1,250 @@
+import math
+import re
+import unicodedata
+
+# Reject a product if its name contains one of these for the ingredient's category
+INVALID_KEYWORDS = {
+    'produce': ['seeds', 'plant', 'garden', 'growing'],
+    'dairy': ['chips', 'snacks', 'artificial'],
+    'meat': ['pet', 'dog', 'cat', 'toy']
+}
+
+# Words that carry no product information in an ingredient line or a title
+STOPWORDS = {
+    'a', 'an', 'and', 'or', 'of', 'the', 'for', 'with', 'to', 'in', 'on', 'into',
+    'plus', 'more', 'about', 'only', 'each', 'per', 'pack', 'count', 'ct', 'oz', 'lb',
+    'fl', 'g', 'kg', 'ml'
+}
+# Store titles name some ingredients differently from recipes
+SYNONYMS = {
+    'scallion': ['green', 'onion'],
+    'cilantro': ['coriander'],
+    'garbanzo': ['chickpea'],
+    'confectioner': ['powdered'],
+}
+# Words after the first comma or in parentheses ("thinly sliced", "dark green parts")
+# are left out of coverage and can only add up to this much on top of it
+DESCRIPTOR_WEIGHT = 0.15
+MATCH_THRESHOLD = 0.6
+# Words that may sit next to the ingredient in a title without changing what
+# the product is ("Salted Butter", "Butter Sticks"); stemmed like title tokens
+MODIFIERS = {
+    'salted', 'unsalted', 'fresh', 'organic', 'whole', 'large', 'small', 'medium',
+    'jumbo', 'extra', 'virgin', 'raw', 'natural', 'pure', 'ground', 'dried', 'dry',
+    'frozen', 'sweet', 'sliced', 'diced', 'chopped', 'minced', 'shredded', 'grated',
+    'boneless', 'skinless', 'lean', 'light', 'low', 'fat', 'free', 'reduced',
+    'sodium', 'original', 'classic', 'premium', 'grade', 'plain', 'creamy', 'crunchy',
+    'smooth', 'chunky', 'red', 'white', 'yellow', 'green', 'brown', 'black', 'baby',
+    'stick', 'block', 'bag', 'bunch', 'can', 'jar', 'bottle', 'carton', 'box',
+    'value', 'brand', 'style', 'petite', 'root', 'head', 'bulb', 'leave', 'leaf',
+    'sprig', 'stalk', 'crown', 'floret', 'clove',
+}
+# score lost for each other word directly before or after the ingredient
+# ("Peanut Butter" or "Butter Beans" for butter)
+COMPOUND_PENALTY = 0.3
+
+# BM25 parameters; titles are short so length normalization is kept mild
+K1 = 1.2
+B = 0.5
+BM25_WEIGHT = 0.8
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def stem(word: str) -> str:
+    """Plural folding good enough for grocery words (tomatoes, berries, cloves)"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Lowercased, accent-folded, stemmed words without stopwords"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def trigrams(text: str) -> set:
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class IngredientQuery:
+    """
+    Weighted terms for one ingredient name.
+
+    The head ("Scallions" in "Scallions, dark green parts only, thinly sliced")
+    carries full weight; descriptors after a comma or inside parentheses
+    get DESCRIPTOR_WEIGHT, and synonyms of head words are accepted in
+    place of them.
+    """
+
+    def __init__(self, ingredient: dict):
+        name = ingredient.get('name') or ''
+        self.category = (ingredient.get('category') or '').lower()
+        head, _, rest = re.sub(r'\([^)]*\)', ',', name).partition(',')
+        self.head = tokenize(head) or tokenize(rest)
+        self.weights = {}
+        for word in tokenize(rest):
+            self.weights.setdefault(word, DESCRIPTOR_WEIGHT)
+        for word in self.head:
+            self.weights[word] = 1.0
+        # a synonym phrase stands in for the head word it replaces
+        self.alternatives = {word: SYNONYMS[word] for word in self.head if word in SYNONYMS}
+        self.phrase = " ".join(self.head)
+        self.grams = trigrams(self.phrase) if self.phrase else set()
+
+
+def _term_frequency(term: str, alternatives: dict, counts: dict) -> float:
+    tf = counts.get(term, 0)
+    if not tf and term in alternatives:
+        # every word of the synonym phrase has to be there
+        tf = min(counts.get(word, 0) for word in alternatives[term])
+    return tf
+
+
+def neighbours(title: str, head: list) -> tuple:
+    """
+    Words directly before and after the ingredient head in a title's first
+    segment ('' when none), and whether the word before opens the title
+    """
+    tokens = tokenize((title or '').split(',')[0])
+    size = len(head)
+    for i in range(len(tokens) - size + 1):
+        if size and tokens[i:i + size] == head:
+            before = tokens[i - 1] if i else ''
+            after = tokens[i + size] if i + size < len(tokens) else ''
+            return before, after, i == 1
+    return '', '', False
+
+
+def compound_words(names: list, head: list) -> list:
+    """
+    For each title, how many words next to the ingredient head make it a
+    different product: "Peanut Butter" or "Butter Beans" for butter. Words
+    in MODIFIERS never count. A word opening the title right before the
+    head is taken for the brand ("Jif Peanut Butter" for peanut butter)
+    unless other titles on the page have it there too.
+    """
+    found = [neighbours(name, head) for name in names]
+    shared = {}
+    for before, _, _ in found:
+        shared[before] = shared.get(before, 0) + 1
+    counts = []
+    for before, after, opens in found:
+        brand = opens and shared[before] == 1
+        count = bool(after) and after not in MODIFIERS
+        count += bool(before) and before not in MODIFIERS and not brand
+        counts.append(int(count))
+    return counts
+
+
+def score_names(names: list, ingredient: dict) -> list:
+    """
+    Score a whole results page against an ingredient in one pass.
+
+    Every title is tokenized once and document frequencies come from the
+    page itself, so a word every tile shares ("cheese" on a cheese search)
+    counts for less than the words that tell tiles apart. The BM25 score is
+    divided by what the same title would score holding every head term once,
+    giving a 0-1 IDF-weighted coverage of the head, and matched descriptors
+    add at most DESCRIPTOR_WEIGHT on top, so a long preparation note cannot
+    drag down a title that names the ingredient. This is blended with character-trigram
+    containment of the ingredient head to catch spellings BM25 misses
+    ("breadcrumbs" / "bread crumbs"). A title containing the whole head phrase
+    scores 1.0, less COMPOUND_PENALTY for each word that makes it a longer
+    product name (see compound_words); titles with the category's invalid
+    keywords score 0.
+    """
+    query = IngredientQuery(ingredient)
+    docs = [tokenize(name) for name in names]
+    if not query.weights:
+        return [0.0] * len(names)
+
+    counts = []
+    df = dict.fromkeys(query.weights, 0)
+    for tokens in docs:
+        doc_counts = {}
+        for token in tokens:
+            doc_counts[token] = doc_counts.get(token, 0) + 1
+        counts.append(doc_counts)
+        for term in df:
+            if _term_frequency(term, query.alternatives, doc_counts):
+                df[term] += 1
+    n = len(docs)
+    avgdl = (sum(len(tokens) for tokens in docs) / n) if n else 1.0
+    # a term no title has is weighted like the rarest term seen, so it still costs coverage
+    idf = {term: math.log(1 + (n - max(freq, 1) + 0.5) / (max(freq, 1) + 0.5))
+           for term, freq in df.items()}
+
+    # whole words only: "Eggplant" is not a plant and "Petite Sirloin" not a pet product
+    invalid = {stem(keyword) for keyword in INVALID_KEYWORDS.get(query.category, [])}
+    extra = compound_words(names, query.head)
+    scores = []
+    for name, tokens, doc_counts, compound in zip(names, docs, counts, extra):
+        if not tokens or invalid.intersection(tokens):
+            scores.append(0.0)
+            continue
+        norm = K1 * (1 - B + B * len(tokens) / (avgdl or 1.0))
+        # [head, descriptors]
+        bm25 = [0.0, 0.0]
+        ideal = [0.0, 0.0]
+        for term, weight in query.weights.items():
+            part = weight < 1.0
+            tf = _term_frequency(term, query.alternatives, doc_counts)
+            bm25[part] += idf[term] * tf * (K1 + 1) / (tf + norm)
+            ideal[part] += idf[term] * (K1 + 1) / (1 + norm)
+        coverage = bm25[0] / ideal[0] if ideal[0] else 0.0
+        if ideal[1]:
+            coverage += DESCRIPTOR_WEIGHT * bm25[1] / ideal[1]
+        coverage = min(1.0, coverage)
+
+        text = " ".join(tokens)
+        if query.phrase and f" {query.phrase} " in f" {text} ":
+            score = 1.0
+        else:
+            overlap = len(query.grams & trigrams(text)) / len(query.grams) if query.grams else 0.0
+            score = min(BM25_WEIGHT * coverage + (1 - BM25_WEIGHT) * overlap, 0.99)
+        scores.append(round(max(score - COMPOUND_PENALTY * compound, 0.0), 3))
+    return scores
+
+
+def score_name(product_name: str, ingredient: dict) -> float:
+    """Score a single product title; without a page every term has the same weight"""
+    return score_names([product_name], ingredient)[0]
+
+
+if __name__ == "__main__":
+    # regression checks: python matching.py
+    scallions = {'name': 'Scallions, dark green parts only, thinly sliced', 'category': 'produce'}
+    checks = [
+        ('Fresh Green Onions', scallions, True),
+        ('Green Bell Pepper', scallions, False),
+        ('Yellow Onions, 3 lb', scallions, False),
+        ('Great Value Unsalted Butter, 16 oz', {'name': 'unsalted butter', 'category': 'dairy'}, True),
+        ('Ginger Root (about 1/4 lb)', {'name': 'Ginger (2-inch piece, peeled and grated)'}, True),
+        ('Garden Tomato Plant', {'name': 'tomatoes', 'category': 'produce'}, False),
+        ('Fresh Eggplant, each', {'name': 'eggplant', 'category': 'produce'}, True),
+        ('Fresh Plantains, each', {'name': 'plantains', 'category': 'produce'}, True),
+        ('Beef Petite Sirloin Steak', {'name': 'sirloin steak', 'category': 'meat'}, True),
+        ('Pedigree Beef Dog Food', {'name': 'ground beef', 'category': 'meat'}, False),
+        ('Jif Creamy Peanut Butter, 16 oz', {'name': 'peanut butter', 'category': 'pantry'}, True),
+        ('Jif Peanut Butter, 16 oz', {'name': 'peanut butter', 'category': 'pantry'}, True),
+    ]
+    failed = 0
+    for title, ingredient, expected in checks:
+        score = score_name(title, ingredient)
+        ok = (score >= MATCH_THRESHOLD) == expected
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {score:.3f}  {title!r} for {ingredient['name']!r}")
+    # on one page, butter has to outrank longer product names that contain it
+    titles = ['Jif Peanut Butter', 'Butter Beans, 15 oz', 'Land O Lakes Salted Butter']
+    page = score_names(titles, {'name': 'butter', 'category': 'dairy'})
+    ok = page[2] > max(page[:2])
+    failed += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {page}  {titles} for 'butter'")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,51 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class StageTimer:
+    """Collects wall-clock durations per pipeline stage (fetch, parse, scale, search, save)"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> dict:
+        """count, p50, p95 and total seconds for every stage seen"""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        return {
+            stage: {
+                'count': len(values),
+                'p50': round(percentile(values, 50), 4),
+                'p95': round(percentile(values, 95), 4),
+                'total': round(sum(values), 4)
+            }
+            for stage, values in samples.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}
@@ -0,0 +1,292 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from aggregate import aggregate_ingredients, distribute_results
+from checkpoint import STAGE_KEYS
+
+STAGES = ("fetch", "parse", "scale", "search")
+
+
+class ParseBatcher:
+    """
+    Groups parse-stage work into multi-recipe LLM requests.
+
+    Records are held until batch_size of them are waiting or linger seconds
+    have passed since the first one arrived, then parsed together with
+    assistant.parse_recipes_batched on the given executor.
+    """
+
+    def __init__(self, assistant, executor: ThreadPoolExecutor, batch_size: int,
+                 linger: float = 0.5):
+        self.assistant = assistant
+        self.executor = executor
+        self.batch_size = batch_size
+        self.linger = linger
+        self._waiting = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: dict) -> Future:
+        future = Future()
+        with self._lock:
+            self._waiting.append((record, future))
+            if len(self._waiting) >= self.batch_size:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.linger, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._waiting:
+            batch, self._waiting = self._waiting, []
+            self.executor.submit(self._run, batch)
+
+    def _run(self, batch: list):
+        try:
+            parsed = self.assistant.parse_recipes_batched(
+                [record['original_recipe'] for record, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (record, future), recipe in zip(batch, parsed):
+            if not recipe or not recipe.get('ingredients'):
+                future.set_exception(ValueError("no ingredients parsed"))
+            else:
+                record['parsed_recipe'] = recipe
+                future.set_result(record)
+
+
+class BatchPipeline:
+    """
+    Run many recipes through fetch, parse, scale and search with the stages
+    overlapping. Each stage has its own worker pool, and a recipe moves to the
+    next pool as soon as its current stage finishes, so page fetches and LLM
+    calls stay in flight while earlier recipes are being searched.
+
+    With aggregate=True the per-recipe search stage is replaced by one merged
+    search after every recipe is scaled: shared ingredients are summed and
+    searched once, and the results are mapped back onto each recipe.
+
+    Each finished stage is checkpointed; when the assistant's resume flag is
+    set, a recipe starts at its first unfinished stage.
+    """
+
+    def __init__(self, assistant, fetch_workers: int = 8, llm_workers: int = 4,
+                 search_workers: int = 1, aggregate: bool = False):
+        self.assistant = assistant
+        self.aggregate = aggregate
+        self.stages = STAGES[:-1] if aggregate else STAGES
+        self.workers = {
+            "fetch": fetch_workers,
+            "parse": llm_workers,
+            "scale": llm_workers,
+            "search": search_workers,
+        }
+
+    def _fetch(self, record: dict) -> dict:
+        record['original_recipe'] = self.assistant.extract_recipe_text(record['url'])
+        return record
+
+    def _parse(self, record: dict) -> dict:
+        parsed = self.assistant.parse_recipe_with_claude(record['original_recipe'])
+        if not parsed or not parsed.get('ingredients'):
+            raise ValueError("no ingredients parsed")
+        record['parsed_recipe'] = parsed
+        return record
+
+    def _scale(self, record: dict) -> dict:
+        record['scaled_recipe'] = self.assistant.scale_recipe(record.pop('parsed_recipe'))
+        return record
+
+    def _search(self, record: dict) -> dict:
+        ingredients = record['scaled_recipe'].get('scaled_ingredients', [])
+        record['walmart_products'] = self.assistant.search_ingredients(
+            ingredients, checkpoint=self.assistant.checkpoint_for(record['url'])
+        )
+        self.assistant.estimate_costs(record['scaled_recipe'], record['walmart_products'])
+        return record
+
+    def _resume(self, url: str):
+        """Record rebuilt from checkpoints and the index of its first unfinished stage"""
+        record = {'url': url}
+        checkpoint = self.assistant.checkpoint_for(url, start=True)
+        if checkpoint is None or not self.assistant.resume:
+            return record, 0
+        start = 0
+        for stage in self.stages:
+            value = checkpoint.load(stage)
+            if value is None:
+                break
+            record[STAGE_KEYS[stage]] = value
+            start += 1
+        if 'scaled_recipe' in record:
+            record.pop('parsed_recipe', None)
+        if 'walmart_products' in record:
+            self.assistant.estimate_costs(record['scaled_recipe'], record['walmart_products'])
+        if start:
+            print(f"Resuming {url} after its {self.stages[start - 1]} stage")
+        return record, start
+
+    def _checkpoint(self, stage: str, record: dict):
+        checkpoint = self.assistant.checkpoint_for(record['url'])
+        if checkpoint is None:
+            return
+        value = record.get(STAGE_KEYS[stage])
+        if stage == "search" and not (value and all(self.assistant.search_succeeded(result) for result in value)):
+            # leave failed searches to be retried on resume
+            return
+        try:
+            checkpoint.save(stage, value)
+        except OSError as e:
+            print(f"Error checkpointing {stage} stage for {record['url']}: {e}")
+
+    def run(self, recipe_urls: list, on_result=None, on_stage=None) -> list:
+        """
+        Process every URL and return one result per URL, in input order.
+
+        on_result(record) is called for each recipe as soon as it is finished
+        (after the merged search in aggregate mode), e.g. to stream it to disk.
+        on_stage(url, stage) is called each time a recipe finishes a stage.
+        """
+        if not recipe_urls:
+            return []
+
+        results = [None] * len(recipe_urls)
+        remaining = [len(recipe_urls)]
+        lock = threading.Lock()
+        finished = threading.Event()
+        handlers = {
+            "fetch": self._fetch,
+            "parse": self._parse,
+            "scale": self._scale,
+            "search": self._search,
+        }
+        pools = {
+            stage: ThreadPoolExecutor(max_workers=self.workers[stage],
+                                      thread_name_prefix=f"recipe-{stage}")
+            for stage in self.stages
+        }
+        batcher = None
+        if getattr(self.assistant, 'llm_mode', None) == "batched":
+            batcher = ParseBatcher(self.assistant, pools["parse"], self.assistant.llm_batch_size)
+
+        def emit(record: dict):
+            try:
+                on_result(record)
+            except Exception as e:
+                print(f"Error handling result for {record.get('url')}: {e}")
+
+        def stage_done(url: str, stage: str):
+            try:
+                on_stage(url, stage)
+            except Exception as e:
+                print(f"Error reporting {stage} stage for {url}: {e}")
+
+        def finish(index: int, record: dict):
+            results[index] = record
+            if on_result is not None and not self.aggregate:
+                emit(record)
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    finished.set()
+
+        def fail(index: int, stage: str, error: Exception):
+            print(f"Error in {stage} stage for {recipe_urls[index]}: {error}")
+            finish(index, {
+                'url': recipe_urls[index],
+                'error': str(error),
+                'stage': stage
+            })
+
+        def advance(index: int, stage_index: int, record: dict):
+            stage = self.stages[stage_index]
+            if stage == "parse" and batcher is not None:
+                future = batcher.submit(record)
+            else:
+                future = pools[stage].submit(handlers[stage], record)
+
+            def on_done(fut):
+                # Future swallows exceptions from callbacks; anything escaping here
+                # would leave the recipe unfinished and run() waiting forever
+                try:
+                    record = fut.result()
+                except Exception as e:
+                    fail(index, stage, e)
+                    return
+                try:
+                    self._checkpoint(stage, record)
+                    if on_stage is not None:
+                        stage_done(recipe_urls[index], stage)
+                    if stage_index + 1 < len(self.stages):
+                        advance(index, stage_index + 1, record)
+                        return
+                except Exception as e:
+                    fail(index, stage, e)
+                    return
+                finish(index, record)
+
+            future.add_done_callback(on_done)
+
+        try:
+            for index, url in enumerate(recipe_urls):
+                try:
+                    record, start = self._resume(url)
+                except Exception as e:
+                    print(f"Error resuming {url}, starting over: {e}")
+                    record, start = {'url': url}, 0
+                if start == len(self.stages):
+                    finish(index, record)
+                    continue
+                try:
+                    advance(index, start, record)
+                except Exception as e:
+                    fail(index, self.stages[start], e)
+            finished.wait()
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+
+        if self.aggregate:
+            self._search_aggregated(results)
+            if on_result is not None:
+                for record in results:
+                    emit(record)
+        return results
+
+    def _search_aggregated(self, results: list):
+        """Search each distinct ingredient across all scaled recipes once"""
+        scaled = [record for record in results if 'error' not in record]
+        recipe_ingredients = [
+            record['scaled_recipe'].get('scaled_ingredients', []) for record in scaled
+        ]
+        merged = aggregate_ingredients(recipe_ingredients)
+        total = sum(len(ingredients) for ingredients in recipe_ingredients)
+        print(f"Searching {len(merged)} distinct items for {total} ingredients "
+              f"across {len(scaled)} recipes...")
+        try:
+            merged_results = self.assistant.search_ingredients(merged)
+        except Exception as e:
+            print(f"Error in search stage for meal plan: {e}")
+            for record in scaled:
+                record['error'] = str(e)
+                record['stage'] = 'search'
+            return
+        # one plan for the whole meal plan, so shared packages are only bought once
+        plan = self.assistant.estimate_costs({'scaled_ingredients': merged}, merged_results)
+        print(f"Estimated meal plan cost: ${plan['total']:.2f}")
+        per_recipe = distribute_results(merged, merged_results, recipe_ingredients)
+        for record, products in zip(scaled, per_recipe):
+            record['walmart_products'] = products
+            record['meal_plan_cost'] = plan['total']
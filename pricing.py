@@ -0,0 +1,87 @@
+import re
+
+from scaling import normalize_unit
+
+# "current price $9.98" is the screen-reader text next to the visible price
+_CURRENT_PRICE = re.compile(r'current price\s*\$\s*(\d[\d,]*(?:\.\d+)?)', re.IGNORECASE)
+_DOLLARS = re.compile(r'\$\s*(\d[\d,]*\.\d{2})')
+# "$6.65/lb", "28.4 ¢/oz", "$0.21/fl oz"
+_UNIT_PRICE = re.compile(r'(\$\s*\d[\d,]*(?:\.\d+)?|\d[\d,]*(?:\.\d+)?\s*¢)\s*/\s*([a-z][a-z. ]*)',
+                         re.IGNORECASE)
+
+
+def parse_price(text: str) -> dict:
+    """
+    Numeric price and unit-price text from a result tile's price text.
+
+    Tiles render the price as split dollars/cents ("$998"), then the
+    "current price $9.98" label and an optional unit price ("$6.65/lb").
+    """
+    if not text:
+        return {'price': None, 'unit_price': None}
+    match = _CURRENT_PRICE.search(text) or _DOLLARS.search(text)
+    unit = _UNIT_PRICE.search(text)
+    return {
+        'price': float(match.group(1).replace(',', '')) if match else None,
+        'unit_price': f"{unit.group(1).replace(' ', '')}/{unit.group(2).strip()}" if unit else None
+    }
+
+
+# "24 oz", "2.5 lb", "32 fl oz", "3 Count", "1 Bunch"; the last size in a title wins
+_SIZE = re.compile(
+    r'(\d+(?:\.\d+)?)\s*-?\s*(fl\.? oz|fluid ounces?|oz|ounces?|lbs?|pounds?|kg|g|grams?|ml|l|liters?|'
+    r'gal(?:lons?)?|qt|quarts?|pt|pints?|count|ct|each|ea|bunch(?:es)?|heads?|pack)\b',
+    re.IGNORECASE
+)
+# "12 x 8 oz", "6 pk, 12 fl oz", "Pack of 4"
+_MULTIPACK = re.compile(r'(\d+)\s*(?:x|×)\s*\d|(?:pack of|case of)\s*(\d+)|(\d+)\s*(?:pk|pack)\b[, ]', re.IGNORECASE)
+_UNIT_PRICE_VALUE = re.compile(r'(\$)?\s*(\d[\d,]*(?:\.\d+)?)\s*(¢)?\s*/\s*([a-z][a-z. ]*)', re.IGNORECASE)
+COUNT_UNITS = {'count', 'ct', 'each', 'ea', 'bunch', 'head', 'pack'}
+
+
+def package_size(name: str) -> tuple:
+    """(size, canonical unit) of the package a product title describes, or (None, None)"""
+    sizes = [(float(value), unit.lower().replace('.', '')) for value, unit in _SIZE.findall(name or '')]
+    measured = [(value, normalize_unit(unit)) for value, unit in sizes
+                if normalize_unit(unit) not in COUNT_UNITS and unit not in COUNT_UNITS]
+    if measured:
+        size, unit = measured[-1]
+        multipack = _MULTIPACK.search(name)
+        if multipack:
+            size *= int(next(group for group in multipack.groups() if group))
+        return size, unit
+    if sizes:
+        return sizes[-1][0], 'count'
+    return None, None
+
+
+def unit_price_value(text: str) -> tuple:
+    """("28.4¢/oz" or "$6.65/lb") -> (dollars per unit, canonical unit), or (None, None)"""
+    match = _UNIT_PRICE_VALUE.search(text or '')
+    if not match:
+        return None, None
+    dollar, value, cents, unit = match.groups()
+    value = round(float(value.replace(',', '')) / (100 if cents and not dollar else 1), 4)
+    unit = normalize_unit(unit.strip())
+    return value, 'count' if unit in COUNT_UNITS else unit
+
+
+def parse_package(tile: dict) -> dict:
+    """
+    Numeric price, package size and unit price for a search result tile.
+
+    The size comes from the title; when the title has none, it is worked
+    out from the price and the per-unit price.
+    """
+    price = tile.get('price_value')
+    unit_price_text = tile.get('unit_price')
+    if price is None or unit_price_text is None:
+        parsed = parse_price(tile.get('price'))
+        price = parsed['price'] if price is None else price
+        unit_price_text = unit_price_text or parsed['unit_price']
+    per_unit, per_unit_unit = unit_price_value(unit_price_text)
+    size, unit = package_size(tile.get('name'))
+    if size is None and price and per_unit:
+        size, unit = round(price / per_unit, 2), per_unit_unit
+    return {'price': price, 'size': size, 'unit': unit,
+            'unit_price': per_unit, 'unit_price_unit': per_unit_unit}
@@ -0,0 +1,59 @@
+from matching import score_name, score_names
+
+NAME_SELECTORS = [
+    "span[data-automation-id='product-title']",
+    "span.normal",
+    "span.f6"
+]
+PRICE_SELECTORS = [
+    "[data-automation-id='product-price']",
+    "div.price-main",
+    "span.price"
+]
+
+# Runs in the page and returns every result tile in one WebDriver round trip
+EXTRACT_TILES_JS = """
+const nameSelectors = arguments[0];
+const priceSelectors = arguments[1];
+const firstText = (tile, selectors, accept) => {
+    for (const selector of selectors) {
+        for (const el of tile.querySelectorAll(selector)) {
+            const text = (el.innerText || el.textContent || '').trim();
+            if (text && accept(text)) return text;
+        }
+    }
+    return null;
+};
+return Array.from(document.querySelectorAll('div[data-item-id]')).map((tile) => {
+    const link = tile.querySelector("a[href*='/ip/']");
+    return {
+        item_id: tile.getAttribute('data-item-id'),
+        name: firstText(tile, nameSelectors, (t) => /[A-Za-z]{2,}/.test(t)),
+        url: link ? link.href : null,
+        price: firstText(tile, priceSelectors, (t) => true)
+    };
+});
+"""
+
+def extract_tiles(driver) -> list:
+    """All result tiles on the current search page as {item_id, name, url, price}"""
+    tiles = driver.execute_script(EXTRACT_TILES_JS, NAME_SELECTORS, PRICE_SELECTORS) or []
+    return [tile for tile in tiles if tile.get('name')]
+
+
+def score_product(product_name: str, ingredient: dict) -> float:
+    """
+    Score how well a product name matches an ingredient, from 0 to 1.
+
+    1 when the ingredient's head phrase appears in the product name, 0 for
+    products with a category's invalid keywords; see matching.score_names.
+    """
+    return score_name(product_name, ingredient)
+
+
+def rank_tiles(tiles: list, ingredient: dict, top_k: int = 5) -> list:
+    """Best top_k tiles for an ingredient, each with a 'score', page order breaking ties"""
+    scores = score_names([tile.get('name') or '' for tile in tiles], ingredient)
+    scored = [dict(tile, score=score) for tile, score in zip(tiles, scores)]
+    scored.sort(key=lambda tile: -tile['score'])
+    return scored[:top_k]
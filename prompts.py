@@ -0,0 +1,135 @@
+import re
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# page furniture that shows up in scraped recipe text and never matters to the parse
+BOILERPLATE = re.compile(
+    r'^(chevron|arrow|triangle|menu|search|skip to main content|newsletter|sign in.*|'
+    r'open navigation menu|jump to recipe|print|share|save|facebook|x|pinterest|instagram|'
+    r'youtube|rss feeds|ad choices|advertisement|privacy policy|user agreement|careers|'
+    r'contact|accessibility help|.*all rights reserved.*|.*affiliate commission.*|'
+    r'.*privacy rights.*|manage account|subscription faqs)$',
+    re.IGNORECASE
+)
+# only short lines are treated as navigation/footer furniture
+BOILERPLATE_MAX_LENGTH = 80
+CHARS_PER_TOKEN = 4
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Token count with the model's local tokenizer (tiktoken), or a chars/4 estimate without it"""
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str) -> str:
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def compact_prompt(prompt: str) -> str:
+    """
+    Drop the source-code indentation and trailing whitespace from a prompt
+    template, keeping any nesting deeper than the template's own indent.
+    """
+    lines = prompt.strip().splitlines()
+    indents = [len(line) - len(line.lstrip()) for line in lines[1:] if line.strip()]
+    base = indents[0] if indents else 0
+    compacted = []
+    for line in lines:
+        indent = len(line) - len(line.lstrip())
+        extra = indent - base if indent > base else 0
+        compacted.append(' ' * extra + line.strip())
+    return re.sub(r'\n{3,}', '\n\n', "\n".join(compacted))
+
+
+def compact_recipe_text(text: str) -> str:
+    """
+    Strip whitespace runs and navigation/footer boilerplate. Repeated lines
+    are kept: a recipe can list the same ingredient twice (crust and
+    filling), and only known boilerplate is ever safe to drop.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = re.sub(r'\s+', ' ', line).strip()
+        if not line:
+            continue
+        if len(line) <= BOILERPLATE_MAX_LENGTH and BOILERPLATE.match(line):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def fit_recipe_text(text: str, budget: int, model: str) -> str:
+    """
+    Compact recipe text and cut it to at most budget tokens.
+
+    When it has to cut, the window starts just before the ingredient list
+    rather than at the top of the page.
+    """
+    text = compact_recipe_text(text)
+    if not budget or count_tokens(text, model) <= budget:
+        return text
+    # "Ingredients" followed by a list or a quantity, not the nav-menu link
+    match = re.search(r'ingredients\s*:?\s*[\n\d½⅓⅔¼¾⅛-]', text, re.IGNORECASE)
+    if match:
+        # keep a little context (title, yield) ahead of the ingredient list
+        start = max(0, match.start() - 400)
+        text = text[start:]
+    return truncate_tokens(text, budget, model)
+
+
+class TokenUsage:
+    """Thread-safe per-call record of prompt and completion tokens"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, model: str, prompt_tokens: int, completion_tokens: int,
+               cached: bool = False, seconds: float = 0.0):
+        entry = {
+            'kind': kind,
+            'model': model,
+            'prompt_tokens': prompt_tokens or 0,
+            'completion_tokens': completion_tokens or 0,
+            'cached': cached,
+            'seconds': seconds
+        }
+        with self._lock:
+            self.calls.append(entry)
+        return entry
+
+    def totals(self) -> dict:
+        with self._lock:
+            calls = [call for call in self.calls if not call['cached']]
+            return {
+                'calls': len(calls),
+                'cached_calls': len(self.calls) - len(calls),
+                'prompt_tokens': sum(call['prompt_tokens'] for call in calls),
+                'completion_tokens': sum(call['completion_tokens'] for call in calls),
+                'seconds': round(sum(call['seconds'] for call in calls), 2)
+            }
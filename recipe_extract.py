@@ -0,0 +1,122 @@
+import html as html_lib
+import json
+import re
+from typing import Optional
+
+_JSONLD_SCRIPT = re.compile(
+    r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+_TAG = re.compile(r'<[^>]+>')
+
+# elements that never hold recipe content
+NOISE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe"]
+# selectors tried in order when looking for the main recipe body
+CONTENT_SELECTORS = [
+    "[itemtype*='schema.org/Recipe']",
+    "[class*='recipe']",
+    "article",
+    "main",
+    "[role='main']",
+]
+
+
+def _is_recipe(node: dict) -> bool:
+    node_type = node.get('@type')
+    if isinstance(node_type, list):
+        return 'Recipe' in node_type
+    return node_type == 'Recipe'
+
+
+def _find_recipe_node(data) -> Optional[dict]:
+    """Walk a JSON-LD document (object, list or @graph) for a Recipe node"""
+    if isinstance(data, list):
+        for item in data:
+            found = _find_recipe_node(item)
+            if found:
+                return found
+    elif isinstance(data, dict):
+        if _is_recipe(data):
+            return data
+        for key in ('@graph', 'mainEntity', 'mainEntityOfPage'):
+            if key in data:
+                found = _find_recipe_node(data[key])
+                if found:
+                    return found
+    return None
+
+
+def find_jsonld_recipe(page_html: str) -> Optional[dict]:
+    """Return the first schema.org Recipe object embedded as JSON-LD, if any"""
+    for block in _JSONLD_SCRIPT.findall(page_html):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            # some sites leave raw control characters in the block
+            try:
+                data = json.loads(re.sub(r'[\x00-\x1f]+', ' ', block.strip()))
+            except ValueError:
+                continue
+        recipe = _find_recipe_node(data)
+        if recipe:
+            return recipe
+    return None
+
+
+def _clean_text(value) -> str:
+    text = html_lib.unescape(_TAG.sub(' ', str(value)))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def recipe_to_text(recipe: dict) -> str:
+    """Render the parts of a JSON-LD Recipe the parse prompt needs as compact text"""
+    lines = []
+    if recipe.get('name'):
+        lines.append(_clean_text(recipe['name']))
+
+    yields = [_clean_text(y) for y in _as_list(recipe.get('recipeYield')) if y]
+    if yields:
+        lines.append(f"Yield: {' / '.join(yields)}")
+
+    lines.append("Ingredients:")
+    for ingredient in _as_list(recipe.get('recipeIngredient') or recipe.get('ingredients')):
+        text = _clean_text(ingredient)
+        if text:
+            lines.append(f"- {text}")
+    return "\n".join(lines)
+
+
+def main_content_text(page_html: str) -> str:
+    """Fallback for pages without JSON-LD: text of the likeliest recipe container"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page_html, 'html.parser')
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+
+    container = None
+    for selector in CONTENT_SELECTORS:
+        candidates = soup.select(selector)
+        if candidates:
+            container = max(candidates, key=lambda el: len(el.get_text()))
+            break
+    if container is None:
+        container = soup.body or soup
+
+    lines = (line.strip() for line in container.get_text(separator="\n").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def extract_recipe(page_html: str) -> str:
+    """Compact recipe text: JSON-LD Recipe when present, main content otherwise"""
+    recipe = find_jsonld_recipe(page_html)
+    if recipe and (recipe.get('recipeIngredient') or recipe.get('ingredients')):
+        return recipe_to_text(recipe)
+    return main_content_text(page_html)
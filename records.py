@@ -0,0 +1,208 @@
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from pricing import parse_price
+from scaling import parse_number, parse_quantity, parse_yield
+
+_LETTERS = re.compile(r'[a-zA-Z]')
+_DIGITS = re.compile(r'\d')
+
+
+class RecordError(ValueError):
+    """An LLM or search record too broken to repair"""
+
+
+def _text(value) -> str:
+    if value is None or isinstance(value, (dict, list, bool)):
+        return ''
+    return str(value).strip()
+
+
+def _number(value):
+    """A number, or a string holding one ("2", "1 1/2"), as an int or float; otherwise None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str):
+        number = parse_number(value)
+    else:
+        return None
+    if number is None:
+        return None
+    number = round(number, 4)
+    return int(number) if number == int(number) else number
+
+
+def _tips(value) -> dict:
+    if not isinstance(value, dict):
+        return {}
+    return {str(name): _text(tip) for name, tip in value.items() if _text(tip)}
+
+
+@dataclass(slots=True)
+class Ingredient:
+    name: str
+    amount: Optional[float] = None
+    unit: str = ''
+    category: str = ''
+    notes: str = ''
+
+    @classmethod
+    def coerce(cls, data, problems: list = None) -> "Ingredient":
+        """
+        Ingredient from an LLM object. Amounts sent as text ("2", "1 1/2",
+        "1 Tbsp. plus 1 tsp.") become numbers; one that can't be read
+        ("to taste") is moved into the notes, and reported in problems when
+        it looked like a quantity. Raises RecordError when there is no name.
+        """
+        if not isinstance(data, dict):
+            raise RecordError("ingredient is not an object")
+        name = _text(data.get('name'))
+        if not name:
+            raise RecordError("ingredient has no name")
+        unit = _text(data.get('unit'))
+        notes = _text(data.get('notes'))
+        amount = data.get('amount')
+        value = None
+        if amount not in (None, ''):
+            if isinstance(amount, (bool, dict, list)):
+                value, parsed_unit = None, unit
+            else:
+                value, parsed_unit = parse_quantity(amount, unit)
+            if value is None:
+                if problems is not None and _DIGITS.search(_text(amount)):
+                    problems.append(f"{name}: amount {amount!r} is not a number")
+                notes = f"{_text(amount)}; {notes}" if notes else _text(amount)
+            elif isinstance(amount, str) and _LETTERS.search(amount):
+                # the amount carried its own unit ("1 Tbsp. plus 1 tsp.")
+                unit = parsed_unit
+            value = _number(value)
+        return cls(name, value, unit, _text(data.get('category')).lower(), notes)
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'amount': self.amount, 'unit': self.unit,
+                'category': self.category, 'notes': self.notes}
+
+
+def coerce_recipe(data) -> tuple:
+    """
+    Validate and repair a parse response.
+
+    Returns (recipe, problems). The recipe has only the known fields, with
+    typed values and nameless ingredients dropped. problems lists whatever
+    was lost or missing on the way, so an empty list means the answer can
+    be used as is.
+    """
+    if not isinstance(data, dict):
+        return {'ingredients': []}, ["response is not an object"]
+    problems = []
+    ingredients = []
+    items = data.get('ingredients')
+    if not isinstance(items, list) or not items:
+        problems.append("no ingredients")
+        items = []
+    for i, item in enumerate(items):
+        try:
+            ingredients.append(Ingredient.coerce(item, problems).to_dict())
+        except RecordError as e:
+            problems.append(f"ingredient {i}: {e}")
+    if items and not ingredients:
+        problems.append("no usable ingredients")
+
+    recipe = {
+        'ingredients': ingredients,
+        'servings': _number(parse_yield(data.get('servings'))),
+        'meal_type': _text(data.get('meal_type')),
+        'portion_size': _text(data.get('portion_size')),
+        'calories_per_serving': _number(data.get('calories_per_serving'))
+    }
+    if recipe['servings'] is None or recipe['servings'] <= 0:
+        problems.append(f"servings {data.get('servings')!r} is not a positive number")
+        recipe['servings'] = None
+    if 'storage_tips' in data:
+        if not isinstance(data['storage_tips'], dict):
+            problems.append("storage_tips is not an object")
+        recipe['storage_tips'] = _tips(data['storage_tips'])
+    return recipe, problems
+
+
+@dataclass(slots=True)
+class ScaledRecipe:
+    scaled_ingredients: list = field(default_factory=list)
+    shopping_list: list = field(default_factory=list)
+    storage_tips: dict = field(default_factory=dict)
+    estimated_cost: Optional[float] = None
+
+    @classmethod
+    def coerce(cls, data) -> "ScaledRecipe":
+        """Scaled recipe from a dict (scale output, a checkpoint or a hand-edited file)"""
+        if not isinstance(data, dict):
+            raise RecordError("scaled recipe is not an object")
+
+        def ingredients(key):
+            records = []
+            for item in data.get(key) or []:
+                try:
+                    records.append(Ingredient.coerce(item))
+                except RecordError as e:
+                    print(f"Dropping {key} entry: {e}")
+            return records
+
+        return cls(ingredients('scaled_ingredients'), ingredients('shopping_list'),
+                   _tips(data.get('storage_tips')), _number(data.get('estimated_cost')))
+
+    def to_dict(self) -> dict:
+        return {
+            'scaled_ingredients': [item.to_dict() for item in self.scaled_ingredients],
+            'shopping_list': [item.to_dict() for item in self.shopping_list],
+            'storage_tips': self.storage_tips,
+            'estimated_cost': self.estimated_cost
+        }
+
+
+@dataclass(slots=True)
+class ProductMatch:
+    name: str
+    url: Optional[str] = None
+    item_id: Optional[str] = None
+    price: Optional[str] = None
+    price_value: Optional[float] = None
+    unit_price: Optional[str] = None
+    score: Optional[float] = None
+
+    @classmethod
+    def coerce(cls, tile) -> "ProductMatch":
+        """Match from a search result tile; the numeric price is read from the price text once here"""
+        if not isinstance(tile, dict):
+            raise RecordError("product is not an object")
+        name = _text(tile.get('name'))
+        if not name:
+            raise RecordError("product has no name")
+        price = _text(tile.get('price')) or None
+        price_value = _number(tile.get('price_value'))
+        unit_price = _text(tile.get('unit_price')) or None
+        if price and (price_value is None or unit_price is None):
+            parsed = parse_price(price)
+            price_value = parsed['price'] if price_value is None else price_value
+            unit_price = unit_price or parsed['unit_price']
+        score = tile.get('score')
+        return cls(name, _text(tile.get('url')) or None, _text(tile.get('item_id')) or None,
+                   price, price_value, unit_price,
+                   float(score) if isinstance(score, (int, float)) and not isinstance(score, bool) else None)
+
+    def to_dict(self) -> dict:
+        """Only the fields that are set, to keep stored candidates small"""
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+
+def coerce_matches(tiles: list) -> list:
+    """ProductMatch for every usable tile, skipping ones without a name"""
+    matches = []
+    for tile in tiles or []:
+        try:
+            matches.append(ProductMatch.coerce(tile))
+        except RecordError:
+            continue
+    return matches
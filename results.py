@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+_COMPACT = (',', ':')
+
+
+def _open_text(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _blob_dir(path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(path)), "blobs")
+
+
+class ResultWriter:
+    """
+    Appends results to a JSONL file (gzip-compressed when the path ends in
+    .gz) as each recipe finishes: one "recipe" record followed by one
+    "product" record per searched ingredient, all sharing a recipe_id.
+
+    Page text is stored once per distinct content under blob_dir, named by
+    its SHA-256, and the recipe record only carries the reference, so
+    nothing larger than one recipe is held while writing and earlier runs
+    are never overwritten.
+    """
+
+    def __init__(self, path: str = "results.jsonl", blob_dir: str = None):
+        self.path = path
+        self.blob_dir = blob_dir or _blob_dir(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = _open_text(path, 'a')
+
+    def write_blob(self, text: str) -> str:
+        """Store text by content hash and return its reference"""
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        blob_path = os.path.join(self.blob_dir, f"{digest}.txt.gz")
+        if not os.path.exists(blob_path):
+            tmp = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, blob_path)
+        return f"sha256:{digest}"
+
+    def write(self, result: dict, url: str = None) -> str:
+        """Append one recipe result; returns its recipe_id"""
+        recipe_id = uuid.uuid4().hex[:16]
+        record = {
+            'type': 'recipe',
+            'recipe_id': recipe_id,
+            'url': url or result.get('url'),
+            'written_at': time.time()
+        }
+        for key, value in result.items():
+            if key == 'original_recipe':
+                record['original_recipe_ref'] = self.write_blob(value) if isinstance(value, str) else None
+            elif key not in ('walmart_products', 'url'):
+                record[key] = value
+        lines = [json.dumps(record, separators=_COMPACT)]
+        for index, product in enumerate(result.get('walmart_products') or []):
+            lines.append(json.dumps(dict(product, type='product', recipe_id=recipe_id, index=index),
+                                    separators=_COMPACT))
+        with self._lock:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+        return recipe_id
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ResultReader:
+    """Lazy reader for files written by ResultWriter"""
+
+    def __init__(self, path: str = "results.jsonl", blob_dir: str = None):
+        self.path = path
+        self.blob_dir = blob_dir or _blob_dir(path)
+
+    def records(self):
+        """Every record in file order, one line at a time"""
+        with _open_text(self.path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def text(self, ref: str) -> str:
+        """Page text for a blob reference"""
+        digest = ref.split(':', 1)[-1]
+        with gzip.open(os.path.join(self.blob_dir, f"{digest}.txt.gz"), 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    def recipes(self, load_text: bool = False):
+        """
+        Recipe results rebuilt in the shape process_recipe_url returns, one
+        at a time. The page text is loaded only when load_text is set.
+        """
+        current = None
+        for record in self.records():
+            kind = record.pop('type', None)
+            if kind == 'recipe':
+                if current is not None:
+                    yield current
+                current = dict(record, walmart_products=[])
+                if load_text and record.get('original_recipe_ref'):
+                    current['original_recipe'] = self.text(record['original_recipe_ref'])
+            elif kind == 'product' and current is not None and record.get('recipe_id') == current['recipe_id']:
+                record.pop('recipe_id')
+                record.pop('index', None)
+                current['walmart_products'].append(record)
+        if current is not None:
+            yield current
@@ -0,0 +1,270 @@
+import math
+import re
+from typing import Optional, Tuple
+
+# US customary units all derive from one fluid ounce / one ounce, so that
+# e.g. 48 tsp is exactly 1 cup rather than a rounding error away from it
+FL_OZ_ML = 29.5735295625
+OZ_G = 28.349523125
+TSP_ML = FL_OZ_ML / 6
+
+# canonical unit -> (dimension, size in base units); volume base is ml, weight base is g
+UNITS = {
+    'pinch': ('volume', TSP_ML / 16),
+    'dash': ('volume', TSP_ML / 8),
+    'tsp': ('volume', TSP_ML),
+    'tbsp': ('volume', TSP_ML * 3),
+    'fl oz': ('volume', FL_OZ_ML),
+    'cup': ('volume', FL_OZ_ML * 8),
+    'pint': ('volume', FL_OZ_ML * 16),
+    'quart': ('volume', FL_OZ_ML * 32),
+    'gallon': ('volume', FL_OZ_ML * 128),
+    'ml': ('volume', 1.0),
+    'l': ('volume', 1000.0),
+    'oz': ('weight', OZ_G),
+    'lb': ('weight', OZ_G * 16),
+    'g': ('weight', 1.0),
+    'kg': ('weight', 1000.0),
+}
+
+UNIT_ALIASES = {
+    'pinches': 'pinch',
+    'dashes': 'dash',
+    't': 'tsp', 'tsp': 'tsp', 'tsps': 'tsp', 'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'tbsp': 'tbsp', 'tbsps': 'tbsp', 'tbs': 'tbsp', 'tbl': 'tbsp',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp',
+    'fl oz': 'fl oz', 'fl. oz': 'fl oz', 'fluid ounce': 'fl oz', 'fluid ounces': 'fl oz',
+    'c': 'cup', 'cups': 'cup',
+    'pints': 'pint', 'pt': 'pint',
+    'quarts': 'quart', 'qt': 'quart',
+    'gallons': 'gallon', 'gal': 'gallon',
+    'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml',
+    'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l',
+    'ounce': 'oz', 'ounces': 'oz',
+    'pound': 'lb', 'pounds': 'lb', 'lbs': 'lb',
+    'gram': 'g', 'grams': 'g', 'gr': 'g',
+    'kilogram': 'kg', 'kilograms': 'kg', 'kgs': 'kg',
+    '': 'count', 'whole': 'count', 'each': 'count', 'ea': 'count', 'piece': 'count', 'pieces': 'count',
+    'cloves': 'clove', 'slices': 'slice', 'bunches': 'bunch', 'heads': 'head',
+    'cans': 'can', 'packages': 'package', 'pkg': 'package', 'sticks': 'stick',
+    'sprigs': 'sprig', 'stalks': 'stalk', 'large': 'count', 'medium': 'count', 'small': 'count',
+}
+
+UNICODE_FRACTIONS = {
+    '½': 1 / 2, '⅓': 1 / 3, '⅔': 2 / 3, '¼': 1 / 4, '¾': 3 / 4, '⅕': 1 / 5, '⅖': 2 / 5,
+    '⅗': 3 / 5, '⅘': 4 / 5, '⅙': 1 / 6, '⅚': 5 / 6, '⅛': 1 / 8, '⅜': 3 / 8, '⅝': 5 / 8, '⅞': 7 / 8,
+}
+
+# display units tried largest first, with the smallest amount worth showing in that unit
+# recipe display units, largest first: (unit, smallest amount shown in it, rounding step)
+VOLUME_DISPLAY = [('cup', 0.25, 0.125), ('tbsp', 1.0, 0.5), ('tsp', 0.0, 0.125)]
+WEIGHT_DISPLAY = [('lb', 1.0, 0.125), ('oz', 0.0, 0.25)]
+# a display unit is only used when rounding to its step changes the amount by at most this
+DISPLAY_TOLERANCE = 0.07
+
+_NUMBER = re.compile(r'(\d+(?:\.\d+)?)(?:\s*/\s*(\d+))?')
+# "4-6", "4 to 6", "4–6 servings"
+_RANGE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:-|–|—|to)\s*(\d+(?:\.\d+)?)')
+_QUANTITY = re.compile(
+    r'(?P<num>\d+(?:\.\d+)?(?:\s+\d+\s*/\s*\d+|\s*/\s*\d+)?\s*[½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞]?|[½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞])'
+    r'\s*(?P<unit>[a-zA-Z][a-zA-Z. ]*?)?\s*(?:$|,|\bplus\b|\band\b|\+)'
+)
+
+
+def normalize_unit(unit) -> str:
+    """Map a free-form unit string onto a canonical unit name"""
+    key = str(unit or '').strip().lower().rstrip('.').replace('.', '')
+    key = re.sub(r'\s+', ' ', key)
+    if key in UNITS:
+        return key
+    if key in UNIT_ALIASES:
+        return UNIT_ALIASES[key]
+    if key.endswith('s') and key[:-1] in UNITS:
+        return key[:-1]
+    return key
+
+
+def parse_number(text: str) -> Optional[float]:
+    """Parse '2', '1.5', '1/3', '1 1/2', '⅓' or '1⅓' into a float"""
+    text = str(text).strip()
+    total = 0.0
+    found = False
+    for char, value in UNICODE_FRACTIONS.items():
+        if char in text:
+            total += value
+            found = True
+            text = text.replace(char, ' ')
+    for whole, denominator in _NUMBER.findall(text.replace('⁄', '/')):
+        if denominator:
+            if float(denominator) == 0:
+                return None
+            total += float(whole) / float(denominator)
+        else:
+            total += float(whole)
+        found = True
+    return total if found else None
+
+
+def parse_quantity(amount, unit='') -> Tuple[Optional[float], str]:
+    """
+    Turn an LLM-provided amount and unit into (value, canonical unit).
+
+    Handles compound strings such as "1 Tbsp. plus 1.75 tsp." by summing the
+    parts in the unit of the first one. Returns (None, unit) when no number
+    can be found.
+    """
+    canonical = normalize_unit(unit)
+    if isinstance(amount, (int, float)) and not isinstance(amount, bool):
+        return float(amount), canonical
+    if amount is None:
+        return None, canonical
+
+    text = str(amount).strip()
+    parts = [(m.group('num'), normalize_unit(m.group('unit') or unit))
+             for m in _QUANTITY.finditer(text)]
+    parts = [(parse_number(num), part_unit) for num, part_unit in parts]
+    parts = [(value, part_unit) for value, part_unit in parts if value is not None]
+    if not parts:
+        return None, canonical
+
+    value, first_unit = parts[0]
+    for extra, extra_unit in parts[1:]:
+        converted = convert(extra, extra_unit, first_unit)
+        if converted is not None:
+            value += converted
+    return value, first_unit
+
+
+def convert(value: float, from_unit: str, to_unit: str) -> Optional[float]:
+    """Convert between units of the same dimension, or None if they don't mix"""
+    if from_unit == to_unit:
+        return value
+    if from_unit not in UNITS or to_unit not in UNITS:
+        return None
+    from_dim, from_size = UNITS[from_unit]
+    to_dim, to_size = UNITS[to_unit]
+    if from_dim != to_dim:
+        return None
+    return value * from_size / to_size
+
+
+def round_up(value: float, step: float) -> float:
+    """Round up to the next multiple of step, ignoring float noise"""
+    steps = value / step
+    nearest = round(steps)
+    if abs(steps - nearest) <= 1e-9 * max(1.0, abs(steps)):
+        return nearest * step
+    return math.ceil(steps) * step
+
+
+def _clean(value: float):
+    value = round(value, 3)
+    return int(value) if value == int(value) else value
+
+
+def kitchen_amount(value: float, unit: str) -> Tuple[float, str]:
+    """
+    Express a scaled amount in the most readable recipe unit, rounded to the
+    nearest step rather than up: 4.5 tbsp stays 4.5 tbsp instead of becoming
+    1/2 cup. Only purchase_amount rounds up.
+    """
+    if unit in UNITS:
+        dimension, size = UNITS[unit]
+        base = value * size
+        choices = VOLUME_DISPLAY if dimension == 'volume' else WEIGHT_DISPLAY
+        if unit in ('ml', 'l', 'g', 'kg', 'pinch', 'dash'):
+            return _clean(value), unit
+        for display, minimum, step in choices:
+            amount = base / UNITS[display][1]
+            if amount < minimum:
+                continue
+            rounded = max(round(amount / step), 1) * step if amount else 0.0
+            if display == choices[-1][0] or abs(rounded - amount) <= DISPLAY_TOLERANCE * amount:
+                return _clean(rounded), display
+    return _clean(round_up(value, 1.0)), unit
+
+
+def purchase_amount(value: float, unit: str, category: str = '') -> Tuple[float, str, str]:
+    """Round a scaled amount up to something that can be bought, with a note"""
+    if unit in UNITS:
+        dimension, size = UNITS[unit]
+        base = value * size
+        if dimension == 'weight':
+            pounds = base / UNITS['lb'][1]
+            if pounds >= 1:
+                return _clean(round_up(pounds, 0.5)), 'lb', ''
+            return _clean(round_up(base / UNITS['oz'][1], 1.0)), 'oz', ''
+        fl_oz = base / UNITS['fl oz'][1]
+        if fl_oz < 2 or category == 'spices':
+            needed = kitchen_amount(value, unit)
+            return 1, 'container', f"need {needed[0]} {needed[1]}"
+        if fl_oz >= 32:
+            return _clean(round_up(fl_oz / 32, 1.0)), 'quart', f"need {_clean(fl_oz)} fl oz"
+        return _clean(round_up(fl_oz, 1.0)), 'fl oz', ''
+    return _clean(round_up(value, 1.0)), unit, ''
+
+
+def parse_yield(servings) -> Optional[float]:
+    """
+    Servings from a recipe yield: a number, the first number in text
+    ("Serves 4 as a main, 6 as a side") or the middle of a range ("4-6").
+    """
+    if isinstance(servings, (int, float)) and not isinstance(servings, bool):
+        return float(servings)
+    if servings is None:
+        return None
+    text = str(servings)
+    match = _RANGE.search(text)
+    if match:
+        return (float(match.group(1)) + float(match.group(2))) / 2
+    match = _QUANTITY.search(text) or _NUMBER.search(text)
+    return parse_number(match.group(1)) if match else None
+
+
+def scale_factor(servings, servings_needed: int) -> float:
+    """Ratio between the meals wanted and the servings the recipe makes"""
+    recipe_servings = parse_yield(servings)
+    if not recipe_servings:
+        return 1.0
+    return servings_needed / recipe_servings
+
+
+def scale_recipe_data(recipe_data: dict, servings_needed: int) -> dict:
+    """
+    Scale a parsed recipe locally.
+
+    Returns the same structure the scale prompt used to return:
+    scaled_ingredients, shopping_list, storage_tips and estimated_cost.
+    Storage tips and cost are left empty for the caller to fill in.
+    """
+    recipe_data = recipe_data or {}
+    factor = scale_factor(recipe_data.get('servings'), servings_needed)
+    scaled_ingredients = []
+    shopping_list = []
+
+    for ingredient in recipe_data.get('ingredients', []):
+        value, unit = parse_quantity(ingredient.get('amount'), ingredient.get('unit', ''))
+        category = str(ingredient.get('category', '')).lower()
+        scaled = dict(ingredient)
+        item = {
+            'name': ingredient.get('name', ''),
+            'amount': ingredient.get('amount'),
+            'unit': ingredient.get('unit', ''),
+            'notes': ingredient.get('notes', '')
+        }
+
+        if value is not None:
+            scaled['amount'], scaled['unit'] = kitchen_amount(value * factor, unit)
+            item['amount'], item['unit'], note = purchase_amount(value * factor, unit, category)
+            if note:
+                item['notes'] = f"{item['notes']}; {note}" if item['notes'] else note
+
+        scaled_ingredients.append(scaled)
+        shopping_list.append(item)
+
+    return {
+        'scaled_ingredients': scaled_ingredients,
+        'shopping_list': shopping_list,
+        'storage_tips': {},
+        'estimated_cost': None
+    }
@@ -0,0 +1,25 @@
+from records import coerce_recipe
+
+
+def recipe_problems(data) -> list:
+    """Problems with a parse response: everything records.coerce_recipe had to repair or drop"""
+    return coerce_recipe(data)[1]
+
+
+def batch_problems(data, count: int) -> list:
+    """Problems with a multi-recipe parse response of count recipes"""
+    if not isinstance(data, dict) or not isinstance(data.get('recipes'), list):
+        return ["no recipes array"]
+    recipes = data['recipes']
+    problems = [] if len(recipes) == count else [f"expected {count} recipes, got {len(recipes)}"]
+    for i, recipe in enumerate(recipes):
+        problems.extend(f"recipe {i}: {problem}" for problem in recipe_problems(recipe))
+    return problems
+
+
+def storage_tips_problems(data) -> list:
+    if not isinstance(data, dict) or not isinstance(data.get('storage_tips'), dict):
+        return ["no storage_tips object"]
+    if not all(isinstance(tip, str) for tip in data['storage_tips'].values()):
+        return ["storage tips are not all strings"]
+    return []
@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+DAY = 24 * 3600
+
+# How long cached prices stay fresh, per ingredient category
+CATEGORY_TTLS = {
+    'produce': 1 * DAY,
+    'meat': 1 * DAY,
+    'dairy': 3 * DAY,
+    'pantry': 7 * DAY,
+    'spices': 14 * DAY,
+}
+DEFAULT_TTL = 3 * DAY
+# Product identity (which items match a query) changes much more slowly than
+# prices; past the price TTL an entry is stale but still usable until this
+IDENTITY_TTL = 30 * DAY
+
+
+class SearchCache:
+    """
+    Persistent cache from search query to ranked product candidates.
+
+    lookup() returns (candidates, fresh). Entries younger than their
+    category's TTL are fresh. Older entries are stale but usable until
+    identity_ttl, and callers can serve them while a refresh runs in the
+    background.
+    """
+
+    def __init__(self, path: str = ".cache/search_cache.sqlite", category_ttls: Optional[dict] = None,
+                 default_ttl: float = DEFAULT_TTL, identity_ttl: float = IDENTITY_TTL):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.category_ttls = dict(CATEGORY_TTLS, **(category_ttls or {}))
+        self.default_ttl = default_ttl
+        self.identity_ttl = identity_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS searches (
+                query TEXT PRIMARY KEY,
+                category TEXT NOT NULL,
+                candidates TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def ttl_for(self, category: str) -> float:
+        return self.category_ttls.get((category or '').lower(), self.default_ttl)
+
+    def lookup(self, query: str, category: str = '') -> Tuple[Optional[list], bool]:
+        """Cached candidates for a query and whether they are still fresh"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT candidates, stored_at FROM searches WHERE query = ?", (query,)
+            ).fetchone()
+            age = time.time() - row[1] if row else None
+            if row is None or age > self.identity_ttl:
+                self.misses += 1
+                return None, False
+            fresh = age <= self.ttl_for(category)
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+        return json.loads(row[0]), fresh
+
+    def store(self, query: str, category: str, candidates: list):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches (query, category, candidates, stored_at) VALUES (?, ?, ?, ?)",
+                (query, (category or '').lower(), json.dumps(candidates, separators=(',', ':')), time.time())
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
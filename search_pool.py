@@ -0,0 +1,207 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+THROTTLE_MARKERS = ("robot or human", "are you a robot", "access denied", "/blocked")
+
+
+class ThrottledError(Exception):
+    """Raised when the store answers a search with a bot check or block page"""
+
+
+def is_throttled(driver) -> bool:
+    """Check whether the current page is a throttling/bot-check page"""
+    try:
+        title = (driver.title or "").lower()
+        url = (driver.current_url or "").lower()
+    except Exception:
+        return False
+    return any(marker in title or marker in url for marker in THROTTLE_MARKERS)
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by all search workers.
+
+    The refill rate grows additively after each successful search and is
+    halved whenever throttling is observed (AIMD), so workers run as fast as
+    the store tolerates instead of sleeping a fixed time per search.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 2, min_rate: float = 0.1,
+                 max_rate: float = 4.0, increase: float = 0.1):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.throttle_count = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self.throttle_count += 1
+
+
+class DriverPool:
+    """
+    Fixed-size pool of browser sessions, created on demand by factory.
+
+    A WebDriver is not thread-safe, so every use goes through driver() or
+    primary(), which hand out a session exclusively until the with block ends.
+    """
+
+    def __init__(self, factory: Callable, size: int = 1, drivers: Optional[list] = None):
+        self.factory = factory
+        self.size = size
+        self._idle = []
+        self._all = []
+        self._lock = threading.Lock()
+        self._returned = threading.Condition(self._lock)
+        for driver in drivers or []:
+            self._all.append(driver)
+            self._idle.append(driver)
+
+    def _borrow(self, wanted=None):
+        """Take an idle driver (only wanted, when given), starting one if the pool is not full yet"""
+        with self._returned:
+            while True:
+                if wanted is not None:
+                    if wanted in self._idle:
+                        self._idle.remove(wanted)
+                        return wanted
+                elif self._idle:
+                    return self._idle.pop()
+                elif len(self._all) < self.size:
+                    # browser startup is serialized; undetected_chromedriver patches
+                    # its binary on first launch and is not safe to start in parallel
+                    driver = self.factory()
+                    self._all.append(driver)
+                    return driver
+                self._returned.wait()
+
+    def _give_back(self, driver):
+        with self._returned:
+            self._idle.append(driver)
+            self._returned.notify_all()
+
+    @contextmanager
+    def driver(self):
+        """Borrow a driver, starting a new one if the pool is not full yet"""
+        driver = self._borrow()
+        try:
+            yield driver
+        finally:
+            self._give_back(driver)
+
+    @contextmanager
+    def primary(self):
+        """
+        Borrow the first driver in the pool (the one logged in to the store),
+        starting it if none is running yet and waiting while a search uses it
+        """
+        with self._lock:
+            if not self._all:
+                driver = self.factory()
+                self._all.append(driver)
+                self._idle.append(driver)
+            first = self._all[0]
+        driver = self._borrow(first)
+        try:
+            yield driver
+        finally:
+            self._give_back(driver)
+
+    def warm(self) -> list:
+        """Start drivers until the pool is full; returns every running driver"""
+        with self._lock:
+            while len(self._all) < self.size:
+                driver = self.factory()
+                self._all.append(driver)
+                self._idle.append(driver)
+            return list(self._all)
+
+    def close(self):
+        with self._lock:
+            for driver in self._all:
+                try:
+                    driver.quit()
+                except Exception as e:
+                    print(f"Error closing browser: {e}")
+            self._all = []
+            self._idle = []
+
+
+class SearchPool:
+    """Run product searches across a DriverPool, returning results in input order"""
+
+    def __init__(self, drivers: DriverPool, limiter: Optional[AdaptiveRateLimiter] = None,
+                 max_attempts: int = 3):
+        self.drivers = drivers
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.max_attempts = max_attempts
+
+    def _run(self, search_fn: Callable, item):
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire()
+            with self.drivers.driver() as driver:
+                try:
+                    result = search_fn(item, driver)
+                except ThrottledError:
+                    self.limiter.on_throttle()
+                    print(f"Throttled (attempt {attempt + 1}), slowing down to "
+                          f"{self.limiter.rate:.2f} searches/s")
+                    continue
+            self.limiter.on_success()
+            return result
+        raise ThrottledError(f"still throttled after {self.max_attempts} attempts")
+
+    def search_all(self, items: list, search_fn: Callable,
+                   on_error: Optional[Callable] = None) -> list:
+        """
+        Call search_fn(item, driver) for every item with one worker per browser.
+
+        If on_error is given, a failed item is replaced by on_error(item, exc)
+        instead of failing the whole batch.
+        """
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.drivers.size, len(items)),
+                                thread_name_prefix="walmart-search") as executor:
+            futures = [executor.submit(self._run, search_fn, item) for item in items]
+            results = []
+            for item, future in zip(items, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    results.append(on_error(item, e))
+            return results
@@ -0,0 +1,397 @@
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# finished jobs kept for GET /jobs/<id>; the oldest are dropped first
+MAX_FINISHED_JOBS = 200
+MAX_BODY_BYTES = 1 << 20
+# idle streams get a heartbeat line this often, which also notices dropped clients
+HEARTBEAT_SECONDS = 15.0
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity; the client should retry later"""
+
+
+class Job:
+    """One submitted batch of recipe URLs and the events it has produced"""
+
+    def __init__(self, urls: list, servings: int = None, aggregate: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.urls = urls
+        self.servings = servings
+        self.aggregate = aggregate
+        self.status = "queued"
+        self.error = None
+        self.results = []
+        self.events = []
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, event: str, **fields):
+        with self._changed:
+            self._emit_locked(event, fields)
+
+    def _emit_locked(self, event: str, fields: dict):
+        self.events.append({'event': event, 'job_id': self.id, **fields, 'time': round(time.time(), 3)})
+        self._changed.notify_all()
+
+    def start(self, worker: int):
+        with self._changed:
+            self.status = "running"
+            self.started = time.time()
+            self._emit_locked("started", {'worker': worker,
+                                          'queued_seconds': round(self.started - self.created, 3)})
+
+    def finish(self, status: str, error: str = None):
+        with self._changed:
+            self.status = status
+            self.error = error
+            self.finished = time.time()
+            failed = sum('error' in result for result in self.results)
+            self._emit_locked(status, {'error': error, 'recipes': len(self.results), 'failed': failed,
+                                       'seconds': round(self.finished - self.started, 3)})
+
+    def follow(self, heartbeat: float = HEARTBEAT_SECONDS):
+        """Every event from the first one on, blocking for new ones until the job is finished"""
+        index = 0
+        while True:
+            with self._changed:
+                if index >= len(self.events) and not self.done:
+                    self._changed.wait(timeout=heartbeat)
+                pending = self.events[index:]
+                index = len(self.events)
+                finished = self.done
+            if not pending and not finished:
+                yield {'event': 'heartbeat', 'job_id': self.id}
+            yield from pending
+            if finished:
+                return
+
+    def summary(self, results: bool = False) -> dict:
+        summary = {
+            'job_id': self.id,
+            'status': self.status,
+            'urls': self.urls,
+            'servings': self.servings,
+            'aggregate': self.aggregate,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error,
+            'recipes_done': len(self.results)
+        }
+        if results:
+            summary['results'] = self.results
+        return summary
+
+
+class RecipeService:
+    """
+    Long-running pool of warm RecipeAssistant workers fed from a bounded queue.
+
+    Each worker owns one assistant whose LLM client and browser sessions are
+    started (and optionally logged in) once at startup, then runs one job at
+    a time through process_recipe_urls, so a job only pays for its own
+    fetches, LLM calls and searches. Submitting to a full queue raises
+    QueueFull instead of letting work pile up.
+    """
+
+    def __init__(self, workers: int = 1, queue_size: int = 8, num_meals: int = 7,
+                 assistant_factory=None, browsers: bool = True, login: bool = False):
+        self.workers = workers
+        self.num_meals = num_meals
+        self.browsers = browsers
+        self.login = login
+        self.assistant_factory = assistant_factory or self._new_assistant
+        self.assistants = []
+        self.jobs = {}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._busy = 0
+        self._completed = 0
+        self._job_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _new_assistant(self):
+        from main import RecipeAssistant
+        return RecipeAssistant(num_meals=self.num_meals)
+
+    def start(self):
+        """Warm every worker's assistant, one at a time, then start taking jobs"""
+        for index in range(self.workers):
+            assistant = self.assistant_factory()
+            print(f"Warming worker {index}...")
+            try:
+                assistant.warm_up(browsers=self.browsers, login=self.login)
+            except Exception as e:
+                # the assistant still starts whatever it needs on first use
+                print(f"Error warming worker {index}: {e}")
+            self.assistants.append(assistant)
+        for index, assistant in enumerate(self.assistants):
+            thread = threading.Thread(target=self._work, args=(index, assistant),
+                                      name=f"recipe-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, urls: list, servings: int = None, aggregate: bool = False) -> Job:
+        """Queue a job; raises QueueFull when the queue is at capacity"""
+        job = Job(urls, servings=servings, aggregate=aggregate)
+        with self._lock:
+            self.jobs[job.id] = job
+            job.emit("queued", position=self._queue.qsize() + 1)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                del self.jobs[job.id]
+                raise QueueFull(f"{self._queue.maxsize} jobs already queued")
+            self._prune_locked()
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _prune_locked(self):
+        finished = sorted((job for job in self.jobs.values() if job.done), key=lambda job: job.finished)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    def _work(self, index: int, assistant):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._busy += 1
+            try:
+                self._run(index, assistant, job)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._completed += 1
+                    self._job_seconds += job.finished - job.started
+
+    def _run(self, index: int, assistant, job: Job):
+        # checkpoints and scaling read the serving count off the assistant
+        assistant.servings_needed = job.servings or self.num_meals
+        job.start(index)
+
+        def on_result(record: dict):
+            # page text stays on disk/in the cache; streamed records stay small
+            record.pop('original_recipe', None)
+            job.results.append(record)
+            job.emit("result", url=record.get('url'), record=record)
+
+        def on_stage(url: str, stage: str):
+            job.emit("stage", url=url, stage=stage)
+
+        try:
+            assistant.process_recipe_urls(job.urls, aggregate=job.aggregate,
+                                          on_result=on_result, on_stage=on_stage)
+        except Exception as e:
+            print(f"Error running job {job.id}: {e}")
+            job.finish("failed", error=str(e))
+            return
+        job.finish("done")
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up"""
+        with self._lock:
+            average = self._job_seconds / self._completed if self._completed else 30.0
+        return max(1, round(average * self._queue.qsize() / max(1, self.workers)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = {}
+            for job in self.jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {
+                'workers': self.workers,
+                'busy': self._busy,
+                'queued': self._queue.qsize(),
+                'queue_size': self._queue.maxsize,
+                'completed': self._completed,
+                'mean_job_seconds': round(self._job_seconds / self._completed, 3) if self._completed else None,
+                'jobs': statuses
+            }
+
+    def close(self):
+        """Let running jobs finish, then shut the assistants down"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        for assistant in self.assistants:
+            try:
+                assistant.cleanup()
+            except Exception as e:
+                print(f"Error cleaning up worker: {e}")
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API for a RecipeService:
+
+        GET  /health             worker and queue stats
+        POST /jobs               {"urls": [...], "servings": 7, "aggregate": false}
+                                 -> 202 with the job, or 429 when the queue is full;
+                                 ?stream=1 streams the job's events instead
+        GET  /jobs/<id>          job status and results
+        GET  /jobs/<id>/events   NDJSON stream of the job's events until it finishes
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, job: Job):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for event in job.follow():
+                self.wfile.write(json.dumps(event, default=str).encode('utf-8') + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # the job keeps running; its results stay available at /jobs/<id>
+            pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        body = self.rfile.read(length) if length else b"{}"
+        return json.loads(body)
+
+    def do_GET(self):
+        service = self.server.service
+        parts = [part for part in urlparse(self.path).path.split('/') if part]
+        if parts == ["health"]:
+            self._send_json(200, service.stats())
+            return
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = service.get(parts[1])
+            if job is None:
+                self._send_json(404, {'error': "unknown job"})
+            elif len(parts) == 2:
+                self._send_json(200, job.summary(results=True))
+            elif parts[2] == "events":
+                self._stream(job)
+            else:
+                self._send_json(404, {'error': "not found"})
+            return
+        self._send_json(404, {'error': "not found"})
+
+    def do_POST(self):
+        service = self.server.service
+        parsed = urlparse(self.path)
+        if parsed.path.rstrip('/') != "/jobs":
+            self._send_json(404, {'error': "not found"})
+            return
+        try:
+            request = self._read_json()
+            urls = request.get('urls') or ([request['url']] if request.get('url') else [])
+            # a bare string would otherwise be taken one character per URL
+            if (not isinstance(urls, list) or not urls
+                    or not all(isinstance(url, str) and url.strip() for url in urls)):
+                raise ValueError("urls must be a non-empty list of recipe URLs")
+            servings = request.get('servings')
+            if servings is not None and (not isinstance(servings, int) or isinstance(servings, bool)
+                                         or servings < 1):
+                raise ValueError("servings must be a positive integer")
+        except (ValueError, AttributeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        try:
+            job = service.submit(urls, servings=servings, aggregate=bool(request.get('aggregate')))
+        except QueueFull as e:
+            self._send_json(429, {'error': str(e)}, {"Retry-After": str(service.retry_after())})
+            return
+        if parse_qs(parsed.query).get('stream', ['0'])[0] not in ('0', 'false', ''):
+            self._stream(job)
+        else:
+            self._send_json(202, job.summary(), {"Location": f"/jobs/{job.id}"})
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: RecipeService, host: str = "127.0.0.1", port: int = 8765,
+                socket_path: str = None):
+    """HTTP server for the service on host:port, or on a Unix socket when socket_path is set"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, ServiceHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ServiceHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve recipe jobs from warm assistant workers"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="listen on this Unix socket instead of host:port")
+    parser.add_argument("--workers", type=int, default=1, help="assistants (each with its own browsers)")
+    parser.add_argument("--queue-size", type=int, default=8, help="jobs waiting before 429")
+    parser.add_argument("--meals", type=int, default=7, help="default servings per job")
+    parser.add_argument("--search-backend", choices=("selenium", "http"), default="selenium")
+    parser.add_argument("--login", action="store_true", help="log in to the store once per worker at startup")
+    parser.add_argument("--no-browsers", action="store_true", help="start browsers on first use instead")
+    args = parser.parse_args(argv)
+
+    def new_assistant():
+        from main import RecipeAssistant
+        assistant = RecipeAssistant(num_meals=args.meals)
+        assistant.search_backend = args.search_backend
+        return assistant
+
+    service = RecipeService(workers=args.workers, queue_size=args.queue_size, num_meals=args.meals,
+                            assistant_factory=new_assistant, browsers=not args.no_browsers,
+                            login=args.login)
+    service.start()
+    server = make_server(service, args.host, args.port, args.socket)
+    print(f"Serving on {args.socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping the service...")
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
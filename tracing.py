@@ -0,0 +1,305 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+
+class Span:
+    """One timed operation; attributes can be added while it is open"""
+
+    def __init__(self, name: str, trace_id: str, parent_id=None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start_ns / 1e9,
+            'duration_ms': round(self.duration_ms, 3),
+            'status': 'error' if self.error else 'ok',
+            'error': self.error,
+            'thread': threading.current_thread().name,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, str):
+        return {'stringValue': value}
+    return {'stringValue': json.dumps(value, default=str)}
+
+
+def otlp_span(span: Span) -> dict:
+    """A finished span in OTLP/JSON form"""
+    otlp = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': 1,
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.end_ns),
+        'attributes': [{'key': key, 'value': _otlp_value(value)}
+                       for key, value in span.attributes.items() if value is not None],
+        'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+    }
+    if span.parent_id:
+        otlp['parentSpanId'] = span.parent_id
+    return otlp
+
+
+class Tracer:
+    """
+    Span recorder for the pipeline stages, LLM calls and browser work.
+
+    Finished spans are appended as JSON lines to path and/or batched to an
+    OTLP/HTTP collector (POST {endpoint}/v1/traces, JSON encoding). With
+    neither configured, span() costs next to nothing. Nesting is tracked per
+    thread; a span opened on a worker thread starts its own trace unless a
+    parent is passed in.
+    """
+
+    def __init__(self, path: str = None, otlp_endpoint: str = None,
+                 service_name: str = "thought-to-table", batch_size: int = 64):
+        self.path = path
+        self.otlp_endpoint = otlp_endpoint.rstrip('/') if otlp_endpoint else None
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.export_errors = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self._pending = []
+        self._exporter = (ThreadPoolExecutor(max_workers=1, thread_name_prefix="otlp-export")
+                          if self.otlp_endpoint else None)
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None or self._exporter is not None
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_span(self):
+        """The innermost open span on this thread, or None"""
+        stack = self._stack() if self.enabled else []
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, parent: Span = None, **attributes):
+        """Open a span around a block; exceptions are recorded and re-raised"""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+        stack = self._stack()
+        parent = parent or (stack[-1] if stack else None)
+        span = Span(name, parent.trace_id if parent else os.urandom(16).hex(),
+                    parent.span_id if parent else None, attributes)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stack.pop()
+            span.end_ns = time.time_ns()
+            self._export(span)
+
+    def bind(self, fn):
+        """Wrap fn so spans it opens on a worker thread nest under the current span"""
+        parent = self.current_span()
+        if parent is None:
+            return fn
+
+        def bound(*args, **kwargs):
+            stack = self._stack()
+            stack.append(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stack.pop()
+        return bound
+
+    def _export(self, span: Span):
+        batch = None
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps(span.to_dict(), default=str) + "\n")
+                self._file.flush()
+            if self._exporter is not None:
+                self._pending.append(span)
+                if len(self._pending) >= self.batch_size:
+                    batch, self._pending = self._pending, []
+        if batch:
+            self._exporter.submit(self._post, batch)
+
+    def _post(self, spans: list):
+        body = {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': self.service_name}}
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': self.service_name},
+                    'spans': [otlp_span(span) for span in spans]
+                }]
+            }]
+        }
+        request = urllib.request.Request(
+            f"{self.otlp_endpoint}/v1/traces",
+            data=json.dumps(body).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+        except Exception as e:
+            self.export_errors += 1
+            print(f"Error exporting {len(spans)} spans to {self.otlp_endpoint}: {e}")
+
+    def flush(self):
+        """Send any batched spans to the collector"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch and self._exporter is not None:
+            self._exporter.submit(self._post, batch)
+
+    def close(self):
+        self.flush()
+        if self._exporter is not None:
+            self._exporter.shutdown(wait=True)
+            self._exporter = None
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack at a fixed interval and writes collapsed
+    stacks ("frame;frame;frame count"), the input format of flamegraph tools.
+    Cheap enough to leave on for a whole run, unlike cProfile.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            frames.append(names.get(ident, str(ident)))
+            self.counts[";".join(reversed(frames))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def _cprofile(path: str):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+        print(summary.getvalue())
+        print(f"cProfile stats saved to {path}")
+
+
+@contextmanager
+def _sampling(path: str):
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        profiler.write(path)
+        print(f"Sampled stacks saved to {path}")
+
+
+def profile_run(mode: str = None, path: str = None):
+    """
+    Profile a block of work.
+
+    mode is None (off), "cprofile" (deterministic, calling thread only) or
+    "sampling" (every thread, low overhead).
+    """
+    if not mode:
+        return nullcontext()
+    if mode == "cprofile":
+        return _cprofile(path or "profile.pstats")
+    if mode == "sampling":
+        return _sampling(path or "profile.folded")
+    raise ValueError(f"unknown profile mode: {mode}")